@@ -0,0 +1,208 @@
+"""
+Low latency audio input.
+
+Samples arrive through PyAudio's callback mode (or from a WAV file) and
+are written into a numpy ring buffer. Analysis reads overlapping
+windows: each window is `window` samples long and a new one is ready
+every `hop` samples, so a 2048 sample FFT can be updated every 512
+samples (~12ms at 44.1kHz) instead of every 46ms.
+
+  audio = AudioInput(window=2048, hop=512).start()
+  for samples in audio.windows():
+    peak = numpy.abs(samples).max()
+
+The ring has a single writer (the callback or WAV thread) and a single
+reader; the writer publishes by advancing `written` after the samples
+are in place, so the ring itself needs no lock. To wake a waiting
+reader the writer sets a threading.Event once per block, which briefly
+takes the Event's internal lock (the reader only holds it inside
+Event.wait, never while copying a window).
+"""
+import struct, threading, time
+import numpy
+
+def load_wav(path):
+  """
+  Memory-map the samples of a 16 bit PCM WAV file. Returns (rate, data)
+  with data an (nFrames, nChannels) int16 array backed by the file.
+
+  (The stdlib wave module is shadowed by wave.py in this directory.)
+  """
+  with open(path, "rb") as f:
+    riff, size, fmt = struct.unpack("<4sI4s", f.read(12))
+    if riff != b"RIFF" or fmt != b"WAVE":
+      raise ValueError("%s is not a WAV file" % path)
+    rate = channels = None
+    while True:
+      header = f.read(8)
+      if len(header) < 8:
+        raise ValueError("%s has no data chunk" % path)
+      tag, size = struct.unpack("<4sI", header)
+      if tag == b"fmt ":
+        fmt = f.read(size)
+        tag, channels, rate, _, _, width = struct.unpack("<HHIIHH", fmt[:16])
+        if tag != 1 or width != 16:
+          raise ValueError("only 16 bit PCM WAV files are supported")
+      elif tag == b"data":
+        if rate is None:
+          raise ValueError("%s has no fmt chunk" % path)
+        offset = f.tell()
+        break
+      else:
+        f.seek(size + (size & 1), 1)
+  nFrames = size//(2*channels)
+  data = numpy.memmap(path, dtype="<i2", mode="r", offset=offset,
+                      shape=(nFrames, channels))
+  return rate, data
+
+def frame_view(samples, window, hop):
+  """
+  Overlapping windows of a 1-D sample array as an (n, window) view,
+  window samples every hop, without copying (e.g. a load_wav memmap).
+  Window k covers samples k*hop .. k*hop+window, like windows().
+  """
+  samples = numpy.asarray(samples)
+  n = max(0, (len(samples)-window)//hop + 1)
+  step = samples.strides[0]
+  return numpy.lib.stride_tricks.as_strided(samples, shape=(n, window),
+                                            strides=(hop*step, step), writeable=False)
+
+class AudioInput(object):
+  def __init__(self, rate=44100, window=2048, hop=512, capacity=None, device=None):
+    if capacity is None:
+      capacity = 8*window
+    self.rate = rate
+    self.window = window
+    self.hop = hop
+    self.device = device
+    self._ring = numpy.zeros(capacity, dtype=numpy.int16)
+    self._out = numpy.zeros(window, dtype=numpy.int16)
+    self.written = 0     #total samples written, only advanced by the writer
+    self.overruns = 0    #samples skipped because the reader fell behind
+    self.eof = False
+    self._consumed = 0   #end of the last window handed to the reader
+    self.stats = None    #stats.Stats timing the wait for each window
+    self._ready = threading.Event()
+    self._pa = None
+    self._stream = None
+    self._continue = None   #pyaudio.paContinue, bound by start()
+    self._thread = None
+
+  def _write(self, samples):
+    n = len(samples)
+    size = len(self._ring)
+    if n > size:
+      samples = samples[-size:]
+      self.written += n-size
+      n = size
+    start = self.written % size
+    first = min(n, size-start)
+    self._ring[start:start+first] = samples[:first]
+    self._ring[:n-first] = samples[first:]
+    self.written += n
+    self._ready.set()
+
+  def _callback(self, in_data, frame_count, time_info, status):
+    self._write(numpy.frombuffer(in_data, dtype=numpy.int16))
+    return None, self._continue
+
+  def start(self):
+    """Open the microphone in callback mode."""
+    import pyaudio
+    self._continue = pyaudio.paContinue
+    self._pa = pyaudio.PyAudio()
+    self._stream = self._pa.open(format=pyaudio.paInt16, channels=1, rate=self.rate,
+                                 input=True, frames_per_buffer=self.hop,
+                                 input_device_index=self.device,
+                                 stream_callback=self._callback)
+    self._stream.start_stream()
+    return self
+
+  def start_wav(self, path, realtime=True):
+    """
+    Feed the ring from a WAV file instead of a microphone, hop samples
+    at a time. With realtime=False the file is read as fast as the
+    reader consumes it, for tests and benchmarks.
+    """
+    self.rate, data = load_wav(path)
+    self._thread = threading.Thread(target=self._feed_wav, args=(data[:, 0], realtime),
+                                    name="audioinput-wav")
+    self._thread.daemon = True
+    self._thread.start()
+    return self
+
+  def _feed_wav(self, data, realtime):
+    tNext = time.time()
+    try:
+      for start in range(0, len(data), self.hop):
+        samples = data[start:start+self.hop]
+        if not realtime:
+          #don't overwrite samples the reader has not seen yet
+          while self.written + len(samples) - (self._consumed - self.window) > len(self._ring):
+            time.sleep(0.001)
+        self._write(samples)
+        if realtime:
+          tNext += len(samples)/float(self.rate)
+          delay = tNext - time.time()
+          if delay > 0:
+            time.sleep(delay)
+    finally:
+      self.eof = True
+      self._ready.set()
+
+  def _copy(self, end):
+    #copy the window ending at sample `end` out of the ring
+    size = len(self._ring)
+    start = (end - self.window) % size
+    first = min(self.window, size-start)
+    self._out[:first] = self._ring[start:start+first]
+    self._out[first:] = self._ring[:self.window-first]
+    return self._out
+
+  def windows(self):
+    """
+    Yield each overlapping window as soon as its last hop has arrived.
+    The yielded array is reused for the next window.
+    """
+    end = self.window
+    size = len(self._ring)
+    while True:
+      stats = self.stats
+      if stats is not None:
+        t = stats.now()
+      while self.written < end:
+        self._ready.clear()
+        if self.written >= end:
+          break
+        if self.eof:
+          return
+        self._ready.wait(0.1)
+      if self.written - end > size - self.window:
+        #reader fell behind the writer: jump to the newest window
+        skipped = self.written - end
+        end = self.written
+        self.overruns += skipped
+        if stats is not None:
+          stats.count("overrun", skipped)
+      window = self._copy(end)
+      if stats is not None:
+        stats.lap("audio", t)
+      self._consumed = end
+      end += self.hop
+      yield window
+
+  def latest(self):
+    """The most recent window, without waiting (for frame-clocked loops)."""
+    written = self.written
+    if written < self.window:
+      self._out.fill(0)
+      return self._out
+    self._consumed = written
+    return self._copy(written)
+
+  def close(self):
+    if self._stream is not None:
+      self._stream.stop_stream()
+      self._stream.close()
+      self._pa.terminate()
+      self._stream = None
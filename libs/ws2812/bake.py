@@ -0,0 +1,230 @@
+"""
+Bake periodic animations into a loop of encoded SPI frames.
+
+Effects that are a pure function of time with a fixed period (rainbow,
+mood, wave, npimage) only need to be rendered and encoded once per
+period. bake() renders one loop at the target fps through the strip's
+own encoder (so gamma, brightness and channel order are baked in) and
+stores the SPI bytes in a file; play() memory-maps it and replays it on
+a FrameClock, which costs almost no CPU.
+
+  def render(frame, t):
+    effects.rainbow(frame, t/VELOCITY)
+  path = bake.bake(strip, render, period=VELOCITY, fps=20,
+                   params=dict(VELOCITY=VELOCITY))
+  bake.play(strip, path)
+
+The file name carries a hash of everything the frames depend on: the
+render function, params, period, fps, strip length, layout and output
+stage. Changing any of them bakes a new file and removes the previous bake of
+the same render function; an unchanged setup reuses it. Loops larger
+than MAX_BYTES are refused. For the render function that is its code, defaults and closure
+values and the globals it reads, following functions defined next to
+it or in this library (effects.plasma, ...) into their code and globals.
+Functions from other packages count by name, and modules by name. Other
+objects count by type only, as do mutable globals such as caches. Pass
+anything they contribute in params.
+"""
+import hashlib, os, struct, sys, tempfile, types
+from fractions import Fraction
+import numpy
+import frameclock
+
+MAGIC = b"WSBK"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIId40s")
+HEADER_SIZE = 128
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "ws2812-bake")
+#largest loop bake() writes; the cache is often on a tmpfs, i.e. in RAM
+MAX_BYTES = 32*1024*1024
+
+def loop_period(periods, limit=600.):
+  """
+  Shortest time after which animations with all of the given periods
+  (in seconds) repeat together: the LCM of the periods as decimal
+  fractions, e.g. (3, 3.1) -> 93. Raises ValueError above limit.
+  """
+  fractions = [Fraction(str(p)).limit_denominator(1000) for p in periods]
+  num = 1
+  den = 0
+  for f in fractions:
+    num = num*f.numerator//_gcd(num, f.numerator)
+    den = _gcd(den, f.denominator)
+  period = float(Fraction(num, den))
+  if period > limit:
+    raise ValueError("periods %s only repeat after %.0f s (limit %.0f s)"
+                     % (", ".join(str(p) for p in periods), period, limit))
+  return period
+
+def _gcd(a, b):
+  while b:
+    a, b = b, a % b
+  return a
+
+#how deep bake_key follows functions calling functions
+MAX_DEPTH = 4
+_PLAIN = (type(None), bool, int, float, complex, str, bytes)
+
+def _name(obj):
+  module = getattr(obj, "__module__", None) or type(obj).__module__
+  name = getattr(obj, "__qualname__", None) or getattr(obj, "__name__", None) or type(obj).__name__
+  return ("%s.%s" % (module, name)).encode("utf-8")
+
+def _local(func, roots):
+  #defined in a file next to the render function or in this library
+  path = getattr(sys.modules.get(func.__module__), "__file__", None)
+  return path is not None and os.path.dirname(os.path.abspath(path)) in roots
+
+def _code_names(code):
+  names = set(code.co_names)
+  for const in code.co_consts:
+    if isinstance(const, types.CodeType):
+      names |= _code_names(const)
+  return names
+
+def _feed(h, obj, roots, seen, depth=0, mutable=True):
+  #hash what the frames rendered by obj can depend on into h
+  if isinstance(obj, _PLAIN):
+    h.update(repr(obj).encode("utf-8"))
+  elif isinstance(obj, tuple):
+    h.update(b"(")
+    for item in obj:
+      _feed(h, item, roots, seen, depth, mutable)
+    h.update(b")")
+  elif isinstance(obj, types.CodeType):
+    #co_code and names, constants recursively: repr() of a nested code
+    #object carries its address and would change on every run
+    h.update(obj.co_code)
+    h.update(repr(obj.co_names).encode("utf-8"))
+    _feed(h, obj.co_consts, roots, seen, depth)
+  elif isinstance(obj, numpy.ndarray):
+    h.update(("%s%r" % (obj.dtype, obj.shape)).encode("utf-8"))
+    h.update(numpy.ascontiguousarray(obj).tobytes())
+  elif mutable and isinstance(obj, (list, dict, set)):
+    h.update(type(obj).__name__.encode("utf-8"))
+    items = sorted(obj.items(), key=repr) if isinstance(obj, dict) else obj
+    if isinstance(obj, set):
+      items = sorted(obj, key=repr)
+    for item in items:
+      _feed(h, item, roots, seen, depth)
+  elif isinstance(obj, types.FunctionType) and depth <= MAX_DEPTH and id(obj) not in seen \
+       and (depth == 0 or _local(obj, roots)):
+    seen.add(id(obj))
+    h.update(_name(obj))
+    _feed(h, obj.__code__, roots, seen, depth)
+    _feed(h, obj.__defaults__, roots, seen, depth)
+    for cell in obj.__closure__ or ():
+      try:
+        value = cell.cell_contents
+      except ValueError:
+        value = None   #not assigned yet
+      _feed(h, value, roots, seen, depth+1)
+    names = sorted(_code_names(obj.__code__))
+    for name in names:
+      if name not in obj.__globals__:
+        continue
+      value = obj.__globals__[name]
+      h.update(name.encode("utf-8"))
+      #globals are read at render time: caches and state do not count
+      _feed(h, value, roots, seen, depth+1, mutable=False)
+      if isinstance(value, types.ModuleType):
+        #module.function calls, e.g. effects.plasma
+        for attr in names:
+          func = getattr(value, attr, None)
+          if isinstance(func, types.FunctionType):
+            _feed(h, func, roots, seen, depth+1)
+  else:
+    h.update(_name(obj))
+
+def bake_key(strip, render, period, fps, params=None):
+  h = hashlib.sha1()
+  roots = set([os.path.dirname(os.path.abspath(__file__))])
+  path = getattr(sys.modules.get(getattr(render, "__module__", None)), "__file__", None)
+  if path is not None:
+    roots.add(os.path.dirname(os.path.abspath(path)))
+  _feed(h, render, roots, set())
+  _feed(h, sorted((params or {}).items()), roots, set())
+  layout = None if strip.layout is None else numpy.asarray(strip.layout.index)
+  _feed(h, (float(period), float(fps), strip.nLED, strip.bits, tuple(strip.gamma),
+            strip.brightness, strip.order, strip.max_mA, layout), roots, set())
+  return h.hexdigest()
+
+def _owner(render):
+  #file name prefix shared by every bake of one render function
+  name = "%s.%s" % (getattr(render, "__module__", "?"),
+                    getattr(render, "__qualname__", getattr(render, "__name__", "?")))
+  return hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+
+def bake(strip, render, period, fps, params=None, cacheDir=CACHE_DIR, maxBytes=MAX_BYTES):
+  """
+  Render render(frame, t) for one period at fps, encode every frame with
+  strip and store them; returns the path of the (possibly cached) file.
+  The frame count is rounded and t stretched so the loop is seamless.
+  Raises ValueError if the loop would take more than maxBytes.
+  """
+  if not strip.arrays:
+    raise ValueError("baking needs a numpy backed Strip")
+  nFrames = max(1, int(round(period*fps)))
+  frameBytes = len(strip._tx)
+  if nFrames*frameBytes > maxBytes:
+    raise ValueError("%d frames of %d bytes need %.0f MiB, more than the %.0f MiB limit; "
+                     "lower the fps or the period" % (nFrames, frameBytes,
+                                                      nFrames*frameBytes/2.**20, maxBytes/2.**20))
+  owner = _owner(render)
+  key = bake_key(strip, render, period, fps, params)
+  path = os.path.join(cacheDir, "%s-%s.bake" % (owner, key))
+  if os.path.exists(path):
+    return path
+  if not os.path.isdir(cacheDir):
+    os.makedirs(cacheDir)
+  #earlier bakes of this render function are stale now
+  for name in os.listdir(cacheDir):
+    if name.startswith(owner + "-") and name.endswith(".bake"):
+      try:
+        os.unlink(os.path.join(cacheDir, name))
+      except OSError:
+        pass
+  fd, tmp = tempfile.mkstemp(dir=cacheDir, suffix=".tmp")
+  os.close(fd)
+  try:
+    out = numpy.memmap(tmp, dtype=numpy.uint8, mode="w+",
+                       shape=(HEADER_SIZE + nFrames*frameBytes,))
+    out[:HEADER.size] = numpy.frombuffer(
+        HEADER.pack(MAGIC, VERSION, nFrames, frameBytes, strip.bits, float(fps),
+                    key.encode("ascii")), dtype=numpy.uint8)
+    frames = out[HEADER_SIZE:].reshape(nFrames, frameBytes)
+    for i in range(nFrames):
+      render(strip.frame, i*float(period)/nFrames)
+      frames[i] = strip.encode()
+    out.flush()
+    del frames, out
+    os.rename(tmp, path)
+  except BaseException:
+    os.unlink(tmp)
+    raise
+  return path
+
+class Loop(object):
+  """A baked loop, memory-mapped read-only."""
+  def __init__(self, path):
+    with open(path, "rb") as f:
+      magic, version, self.nFrames, self.frameBytes, self.bits, self.fps, key = \
+          HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+      raise ValueError("%s is not a baked loop" % path)
+    self.key = key.decode("ascii")
+    self.frames = numpy.memmap(path, dtype=numpy.uint8, mode="r", offset=HEADER_SIZE,
+                               shape=(self.nFrames, self.frameBytes))
+
+def play(strip, path, loops=None):
+  """Replay a baked loop on strip at its fps, forever or `loops` times."""
+  loop = Loop(path)
+  if loop.frameBytes != len(strip._tx) or loop.bits != strip.bits:
+    raise ValueError("%s was baked for another strip length or encoding" % path)
+  i = 0
+  for t in frameclock.FrameClock(loop.fps):
+    #dropped frames advance the clock, keep the loop in time with it
+    i = int(round(t*loop.fps))
+    if loops is not None and i >= loops*loop.nFrames:
+      break
+    strip._write(loop.frames[i % loop.nFrames])
@@ -0,0 +1,220 @@
+#!/usr/bin/python
+"""
+Off-target benchmark of every encoder, using the fakespi emulator
+instead of /dev/spidev, so it runs on any Linux box.
+
+For each encoder and strip length it reports
+  ms        time per frame to encode and hand over to the (fake) device
+  kLED/s    encode throughput
+  alloc     peak bytes allocated by one call (tracemalloc); for numpy
+            backed Strips encode() itself is also checked to allocate
+            no more than ENCODE_ALLOC bytes, whatever the strip length,
+            also with a channel reorder and over max_mA
+  ok        whether the emulator decoded exactly the input pixels
+  fps       end-to-end frames per second rendering effects.plasma with
+            the emulator taking real wire time (Strip based encoders)
+
+With -e it benchmarks the float effect kernels (effects.py, wave.py)
+against their fixed-point versions (fixedpoint.py) instead:
+  float/fixed   ms per frame of each
+  diff          largest difference on any channel over the timed frames
+
+Usage: python bench.py [-j] [-e] [-n 8,64,300] [-t seconds]
+  -j, --json    one JSON object per line instead of a table
+  -e, --effects float vs fixed-point effect kernels
+"""
+import numpy
+import sys, getopt, json, timeit, tracemalloc
+import ws2812, fakespi, effects, fixedpoint
+
+NLEDS = [8, 64, 144, 300, 1000, 3000, 10000]
+#Strip.encode works in preallocated buffers: only a few Python objects per call
+ENCODE_ALLOC = 2048
+
+def stateless(function, **kwargs):
+    def setup(spi, nLED):
+        return lambda data: function(spi, data, **kwargs)
+    return setup
+
+def strip(cls=ws2812.Strip, **kwargs):
+    def setup(spi, nLED):
+        s = cls(spi, nLED, **kwargs)
+        def show(data):
+            s.show(data)
+            if hasattr(s, "flush"):
+                s.flush()
+        show.strip = s
+        return show
+    return setup
+
+ENCODERS = [
+    ("write2812_numpy4", stateless(ws2812.write2812_numpy4), False),
+    ("write2812_numpy8", stateless(ws2812.write2812_numpy8), False),
+    ("write2812_pylist4", stateless(ws2812.write2812_pylist4), True),
+    ("write2812_pylist8", stateless(ws2812.write2812_pylist8), True),
+    ("write2812_numpylut3", stateless(ws2812.write2812_numpylut, bits=3), False),
+    ("write2812_numpylut4", stateless(ws2812.write2812_numpylut, bits=4), False),
+    ("write2812_numpylut8", stateless(ws2812.write2812_numpylut, bits=8), False),
+    ("write2812_pylut3", stateless(ws2812.write2812_pylut, bits=3), True),
+    ("write2812_pylut4", stateless(ws2812.write2812_pylut, bits=4), True),
+    ("write2812_pylut8", stateless(ws2812.write2812_pylut, bits=8), True),
+    ("Strip3", strip(bits=3), False),
+    ("Strip4", strip(bits=4), False),
+    ("Strip8", strip(bits=8), False),
+    ("Strip4-stdlib", strip(bits=4, backend="stdlib"), False),
+    ("ThreadedStrip4", strip(ws2812.ThreadedStrip, latest=False), False),
+]
+
+def wave_float(out, t, periods=(2, 2.1, 2.2), intensity=20):
+    #the render of wave.test_pattern_sin
+    n = len(out)
+    indices = 4*numpy.arange(n)*numpy.pi/n
+    f = numpy.zeros((n, 3))
+    for c, period in enumerate(periods):
+        f[:, c] = numpy.sin(-2*numpy.pi*t/period + indices)
+    out[:] = numpy.array(intensity*((f+1.0)/2.0), dtype=numpy.uint8)
+
+EFFECTS = [
+    ("plasma", effects.plasma, fixedpoint.plasma, ()),
+    ("audio_plasma", effects.audio_plasma, fixedpoint.audio_plasma, (12000,)),
+    ("rainbow", effects.rainbow, fixedpoint.rainbow, ()),
+    ("wave", wave_float, fixedpoint.wave, ()),
+]
+
+def run_effect(name, floatfn, fixedfn, args, nLED, seconds):
+    result = {"effect": name, "nLED": nLED}
+    a = numpy.zeros((nLED, 3), dtype=numpy.uint8)
+    b = numpy.zeros((nLED, 3), dtype=numpy.uint8)
+    for key, fn, out in (("float", floatfn, a), ("fixed", fixedfn, b)):
+        frames = [0]
+        def frame(out):
+            frames[0] += 1
+            fn(out, 0.037*frames[0], *args)
+        result[key] = 1000*timed(frame, out, seconds)
+    diff = 0
+    for k in range(100):
+        floatfn(a, 0.37*k, *args)
+        fixedfn(b, 0.37*k, *args)
+        diff = max(diff, int(numpy.abs(a.astype(numpy.int16) - b).max()))
+    result["diff"] = diff
+    return result
+
+def timed(call, data, seconds):
+    #calls per second over roughly `seconds`, at least 3 calls
+    number = 1
+    while True:
+        t = timeit.timeit(lambda: call(data), number=number)
+        if t >= seconds or number >= 3 and t >= seconds/10:
+            return t/number
+        number *= 2 if t > 0 else 10
+
+def allocated(call, data):
+    tracemalloc.start()
+    try:
+        call(data)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def frame_rate(setup, nLED, seconds):
+    spi = fakespi.SpiDev(0, 0, realtime=True, decoding=False)
+    s = setup(spi, nLED).strip
+    frame = s.frame if s.arrays else numpy.zeros((nLED, 3), dtype=numpy.uint8)
+    nFrame = 0
+    tStart = timeit.default_timer()
+    while timeit.default_timer()-tStart < seconds:
+        effects.plasma(frame, 0.1*nFrame)
+        if not s.arrays:
+            s.frame[:] = frame.tobytes()
+        s.show()
+        nFrame += 1
+    if hasattr(s, "close"):
+        s.close()
+    return nFrame/(timeit.default_timer()-tStart)
+
+def run(name, setup, pylist, nLED, seconds):
+    result = {"encoder": name, "nLED": nLED}
+    pixels = numpy.random.RandomState(nLED).randint(0, 256, (nLED, 3)).astype(numpy.uint8)
+    data = pixels.tolist() if pylist else pixels
+    try:
+        check = fakespi.SpiDev(0, 0)
+        setup(check, nLED)(data)
+        received = check.last()
+        result["ok"] = (received is not None and not check.errors and
+                        numpy.array_equal(received, pixels))
+        spi = fakespi.SpiDev(0, 0, decoding=False)
+        call = setup(spi, nLED)
+        call(data)
+        t = timed(call, data, seconds)
+        result["ms"] = 1000*t
+        result["kLEDps"] = nLED/t/1000
+        result["alloc"] = allocated(call, data)
+        s = getattr(call, "strip", None)
+        if s is not None and s.arrays:
+            #plain, reordered, and current limited (the random frame is over 1 mA)
+            for output in (dict(), dict(order="GRB"), dict(max_mA=1.0)):
+                s.set_output(**output)
+                s.encode()
+                alloc = allocated(lambda data: s.encode(), None)
+                assert alloc <= ENCODE_ALLOC, "%s encode(%s) allocated %d bytes for %d LEDs" % (
+                    name, output, alloc, nLED)
+            s.set_output()
+        if hasattr(call, "strip"):
+            result["fps"] = frame_rate(setup, nLED, seconds)
+            if hasattr(call.strip, "close"):
+                call.strip.close()
+    except OverflowError as err:
+        result["error"] = str(err)
+    return result
+
+def usage():
+    print(__doc__.strip())
+
+if __name__=="__main__":
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hjen:t:", ["help", "json", "effects", "nLED=", "time="])
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+        sys.exit(2)
+    asJson=False
+    effectsOnly=False
+    nLEDs=NLEDS
+    seconds=0.2
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+            sys.exit()
+        elif o in ("-j", "--json"):
+            asJson=True
+        elif o in ("-e", "--effects"):
+            effectsOnly=True
+        elif o in ("-n", "--nLED"):
+            nLEDs=[int(n) for n in a.split(",")]
+        elif o in ("-t", "--time"):
+            seconds=float(a)
+
+    if effectsOnly:
+        for name, floatfn, fixedfn, args in EFFECTS:
+            for nLED in nLEDs:
+                r = run_effect(name, floatfn, fixedfn, args, nLED, seconds)
+                if asJson:
+                    print(json.dumps(r))
+                else:
+                    print("{effect:<14s}(nLED={nLED:5d}): float {float:8.3f} ms fixed {fixed:8.3f} ms "
+                          "{speedup:5.1f}x diff {diff:d}".format(speedup=r["float"]/r["fixed"], **r))
+                sys.stdout.flush()
+        sys.exit()
+
+    for name, setup, pylist in ENCODERS:
+        for nLED in nLEDs:
+            r = run(name, setup, pylist, nLED, seconds)
+            if asJson:
+                print(json.dumps(r))
+            elif "error" in r:
+                print("{encoder:<20s}(nLED={nLED:5d}): {error}".format(**r))
+            else:
+                print("{encoder:<20s}(nLED={nLED:5d}): {ms:8.2f} ms {kLEDps:8.1f} kLED/s "
+                      "{alloc:9d} B {ok!s:5s}{rate}".format(
+                          rate=" %7.1f fps" % r["fps"] if "fps" in r else "", **r))
+            sys.stdout.flush()
@@ -0,0 +1,104 @@
+"""
+Layer compositor.
+
+Each layer is an (nLED, 3) uint8 frame an effect renders into, with a
+blend mode, an opacity and an optional per-pixel mask. flatten() stacks
+them bottom to top into an output frame using in-place numpy ufuncs on
+preallocated float buffers, so every layer costs a few vectorized
+passes and no temporaries:
+
+  comp = Compositor(PIXELS)
+  mood = comp.add()
+  bass = comp.add("screen", opacity=0.8)
+  effects.plasma(mood.frame, t)
+  bass.frame[:] = color
+  comp.flatten(strip.frame)
+  strip.show()
+"""
+import numpy
+
+MODES = ("normal", "add", "multiply", "max", "screen")
+
+class Layer(object):
+  def __init__(self, nLED, mode="normal", opacity=1.0, mask=None, visible=True):
+    if mode not in MODES:
+      raise ValueError("mode must be one of %s, got %r" % (", ".join(MODES), mode))
+    self.frame = numpy.zeros((nLED, 3), dtype=numpy.uint8)
+    self.mode = mode
+    self.visible = visible
+    self._opacity = opacity
+    self._mask = None
+    self.set_mask(mask)
+
+  @property
+  def opacity(self):
+    return self._opacity
+
+  @opacity.setter
+  def opacity(self, opacity):
+    self._opacity = opacity
+    self._update_alpha()
+
+  def set_mask(self, mask):
+    """Per-pixel coverage 0..1 (or bool), None for the whole strip."""
+    self._mask = None if mask is None else numpy.asarray(mask, dtype=numpy.float32).reshape(-1, 1)
+    self._update_alpha()
+
+  def _update_alpha(self):
+    if self._mask is None:
+      self._alpha = None
+    else:
+      self._alpha = self._mask*numpy.float32(self._opacity)
+
+class Compositor(object):
+  def __init__(self, nLED):
+    self.nLED = nLED
+    self.layers = []
+    self._acc = numpy.zeros((nLED, 3), dtype=numpy.float32)
+    self._src = numpy.zeros((nLED, 3), dtype=numpy.float32)
+    self._tmp = numpy.zeros((nLED, 3), dtype=numpy.float32)
+
+  def add(self, mode="normal", opacity=1.0, mask=None):
+    """Add a layer on top of the stack and return it."""
+    layer = Layer(self.nLED, mode, opacity, mask)
+    self.layers.append(layer)
+    return layer
+
+  def remove(self, layer):
+    self.layers.remove(layer)
+
+  def _blend(self, layer):
+    acc, src, tmp = self._acc, self._src, self._tmp
+    numpy.copyto(src, layer.frame)
+    mode = layer.mode
+    if mode == "add":
+      numpy.add(src, acc, out=src)
+      numpy.minimum(src, 255, out=src)
+    elif mode == "multiply":
+      numpy.multiply(src, acc, out=src)
+      src *= 1/255.
+    elif mode == "max":
+      numpy.maximum(src, acc, out=src)
+    elif mode == "screen":
+      #a + b - a*b/255
+      numpy.multiply(src, acc, out=tmp)
+      tmp *= 1/255.
+      src += acc
+      src -= tmp
+    #acc += (blended - acc)*alpha
+    src -= acc
+    if layer._alpha is not None:
+      src *= layer._alpha
+    elif layer.opacity != 1:
+      src *= layer.opacity
+    acc += src
+
+  def flatten(self, out):
+    """Composite all visible layers over black into out, (nLED, 3) uint8."""
+    self._acc.fill(0)
+    for layer in self.layers:
+      if layer.visible and layer.opacity > 0:
+        self._blend(layer)
+    numpy.rint(self._acc, out=self._acc)
+    numpy.copyto(out, self._acc, casting="unsafe")
+    return out
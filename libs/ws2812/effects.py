@@ -0,0 +1,81 @@
+"""
+Whole-frame effect kernels.
+
+Every kernel fills a caller-supplied (nLED, 3) buffer (usually
+Strip.frame) in one vectorized call instead of looping over pixels.
+"""
+import numpy
+
+_index_cache = {}
+
+def _index(n):
+  #pixel positions 0..n-1 as floats, shared between calls
+  idx = _index_cache.get(n)
+  if idx is None:
+    idx = _index_cache[n] = numpy.arange(n, dtype=numpy.float64)
+  return idx
+
+def _store(out, f):
+  #clamp to 0..255 and truncate like int() into the output buffer
+  numpy.clip(f, 0, 255, out=f)
+  out[...] = f
+
+def hsv_to_rgb(h, s, v, out=None):
+  """
+  Vectorized colorsys.hsv_to_rgb. h, s and v are arrays (or scalars)
+  broadcast against each other; returns an (..., 3) float array.
+  """
+  h, s, v = numpy.broadcast_arrays(numpy.asarray(h, dtype=numpy.float64),
+                                   numpy.asarray(s, dtype=numpy.float64),
+                                   numpy.asarray(v, dtype=numpy.float64))
+  if out is None:
+    out = numpy.empty(h.shape + (3,))
+  h6 = h*6.0
+  i = numpy.floor(h6)
+  f = h6 - i
+  i = i.astype(numpy.int64) % 6
+  p = v*(1.0-s)
+  q = v*(1.0-s*f)
+  t = v*(1.0-s*(1.0-f))
+  out[..., 0] = numpy.choose(i, (v, q, p, p, t, v))
+  out[..., 1] = numpy.choose(i, (t, v, v, q, p, p))
+  out[..., 2] = numpy.choose(i, (p, p, t, v, v, q))
+  return out
+
+def rainbow(out, t, brightness=255):
+  """Hue wheel spread over the strip, rotated by t (in turns)."""
+  n = len(out)
+  h = _index(n)/n + t
+  h %= 1.0
+  _store(out, hsv_to_rgb(h, 1.0, brightness))
+
+def plasma(out, m, amplitude=255, p1=7., p2=5.):
+  """
+  Three drifting sine waves, one per channel, at phase m:
+    r = sin(m+i/p1), g = sin(-m+i/p1), b = sin(3.5*m+i/p2)
+  mapped from -1..1 to 0..amplitude.
+  """
+  i = _index(len(out))
+  f = numpy.empty(out.shape)
+  numpy.sin(m + i/p1, out=f[:, 0])
+  numpy.sin(-m + i/p1, out=f[:, 1])
+  numpy.sin(m*3.5 + i/p2, out=f[:, 2])
+  f += 1
+  f *= amplitude/2.
+  _store(out, f)
+
+def audio_plasma(out, m, peak, gain=1/50., offset=-35):
+  """plasma() whose amplitude follows the audio peak (vumood2)."""
+  plasma(out, m, amplitude=peak*gain + offset)
+
+def spectrum(out, levels, brightness=255):
+  """
+  Spread band levels (0..1, e.g. SpectrumAnalyzer.level) across the
+  strip, lowest band first, hue running from red to blue.
+  """
+  n = len(out)
+  nBands = len(levels)
+  band = (_index(n)*nBands//n).astype(numpy.intp)
+  h = band*(0.66/nBands)
+  v = numpy.take(levels, band)*brightness
+  _store(out, hsv_to_rgb(h, 1.0, v))
@@ -0,0 +1,141 @@
+"""
+Hardware-free stand-in for spidev.SpiDev.
+
+Everything written to it is decoded back into pixel bytes (in wire
+order, i.e. GRB for a WS2812 strip) and the high/low times of every
+symbol are checked against the WS2812 timing at the configured
+max_speed_hz, so encoders can be verified and benchmarked on any Linux
+box:
+
+  spi = fakespi.SpiDev()
+  spi.open(0, 0)
+  strip = ws2812.Strip(spi, 8)
+  strip.show([[10, 0, 0]]*8)
+  spi.last()        -> (8, 3) array of the bytes the strip received
+  spi.errors        -> timing violations, if any
+
+Transfers that follow each other within `latch` seconds (as chunked
+frames do) belong to the same frame; a longer idle time latches it.
+With realtime=True each transfer also takes as long as it would on the
+wire, for end-to-end frame rate measurements.
+"""
+import time
+import numpy
+
+#T0H and T1H windows in seconds, from the timings in ws2812.py +-150ns
+T0H = (0.20e-6, 0.50e-6)
+T1H = (0.55e-6, 0.85e-6)
+#shortest low time between symbols
+TL_MIN = 0.20e-6
+LATCH = 50e-6
+BUFSIZ = 4096
+
+def decode(data, speed, latch=LATCH):
+  """
+  Decode a WS2812 SPI bitstream sent at `speed` Hz.
+  Returns (frames, errors): one (n, 3) uint8 array per latched frame and
+  a list of timing violation messages.
+  """
+  bits = numpy.unpackbits(numpy.frombuffer(bytes(data), dtype=numpy.uint8))
+  errors = []
+  if not bits.any():
+    return [], errors
+  change = numpy.flatnonzero(bits[1:] != bits[:-1]) + 1
+  starts = numpy.concatenate(([0], change))
+  lengths = numpy.diff(numpy.concatenate((starts, [len(bits)])))
+  values = bits[starts]
+  seconds = lengths/float(speed)
+  if values[0] == 0:
+    #idle low before the first symbol
+    values, seconds, starts = values[1:], seconds[1:], starts[1:]
+  high = seconds[0::2]
+  low = seconds[1::2]
+  symbols = numpy.zeros(len(high), dtype=numpy.uint8)
+  symbols[(high >= T1H[0]) & (high <= T1H[1])] = 1
+  bad = ~(((high >= T0H[0]) & (high <= T0H[1])) | (symbols == 1))
+  for i in numpy.flatnonzero(bad)[:10]:
+    errors.append("symbol %d: high for %.0f ns" % (i, 1e9*high[i]))
+  short = numpy.flatnonzero(low < TL_MIN)
+  for i in short[:10]:
+    errors.append("symbol %d: low for %.0f ns" % (i, 1e9*low[i]))
+
+  #a low time of at least `latch` inside the stream ends a frame
+  frames = []
+  resets = numpy.flatnonzero(low >= latch) + 1
+  for chunk in numpy.split(symbols, resets):
+    if len(chunk) % 24:
+      errors.append("frame of %d bits is not a whole number of LEDs" % len(chunk))
+      chunk = chunk[:len(chunk)//24*24]
+    frames.append(numpy.packbits(chunk).reshape(-1, 3))
+  return frames, errors
+
+class SpiDev(object):
+  def __init__(self, bus=None, cs=None, realtime=False, decoding=True, latch=LATCH):
+    self.max_speed_hz = 500000
+    self.mode = 0
+    self.bits_per_word = 8
+    self.bufsiz = BUFSIZ
+    self.realtime = realtime
+    self.decoding = decoding
+    self.latch = latch
+    self.frames = []
+    self.errors = []
+    self.transfers = 0
+    self.bytesWritten = 0
+    self._pending = bytearray()
+    self._speed = None
+    self._tEnd = 0.0
+    if bus is not None:
+      self.open(bus, cs or 0)
+
+  def open(self, bus, cs):
+    self.bus = bus
+    self.cs = cs
+
+  def close(self):
+    self.flush()
+
+  def _transfer(self, data):
+    now = time.perf_counter()
+    if now - self._tEnd >= self.latch or self.max_speed_hz != self._speed:
+      self.flush()
+    self._speed = self.max_speed_hz
+    self.transfers += 1
+    self.bytesWritten += len(data)
+    if self.decoding:
+      self._pending += data
+    if self.realtime:
+      #sleep like the spidev ioctl does, releasing the GIL, and spin
+      #for the last bit so sleep overshoot doesn't show up as bus gaps
+      end = now + len(data)*8.0/self.max_speed_hz
+      if end-now > 200e-6:
+        time.sleep(end-now-200e-6)
+      while time.perf_counter() < end:
+        pass
+    self._tEnd = time.perf_counter()
+
+  def writebytes(self, values):
+    if len(values) > self.bufsiz:
+      raise OverflowError("Argument list size exceeds %d bytes." % self.bufsiz)
+    self._transfer(bytearray(values))
+
+  def writebytes2(self, values):
+    self._transfer(memoryview(values).cast("B") if not isinstance(values, list)
+                   else bytearray(values))
+
+  def xfer2(self, values):
+    self.writebytes(values)
+    return [0]*len(values)
+
+  def flush(self):
+    """Latch the frame being received and decode it."""
+    if self._pending:
+      frames, errors = decode(self._pending, self._speed, self.latch)
+      self.frames.extend(frames)
+      self.errors.extend(errors)
+      self._pending = bytearray()
+
+  def last(self):
+    """The last complete frame the strip received."""
+    self.flush()
+    return self.frames[-1] if self.frames else None
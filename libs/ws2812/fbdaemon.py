@@ -0,0 +1,223 @@
+#!/usr/bin/python
+"""
+Shared-memory framebuffer daemon.
+
+One process owns the SPI device; any number of local producers write
+pixels into a memory-mapped framebuffer and signal "frame ready" over a
+small Unix datagram socket. No pixel data is serialized or copied: the
+daemon encodes straight from the shared mapping, at most `fps` times a
+second, so producers can run on other cores.
+
+Daemon:
+  python fbdaemon.py -n 300 -s 1 -f 60
+
+Producer (any process):
+  fb = fbdaemon.FrameBuffer()
+  effects.plasma(fb.frame, t)
+  fb.ready()
+
+Layout of the mapping: a 16 byte header (magic, version, nLED, frame
+counter) followed by nLED*3 RGB bytes.
+
+The framebuffer and the control socket are created with mode 0660, so
+producers must run as the daemon's user or group (-m changes it).
+"""
+import mmap, os, socket, struct, sys, time, getopt
+import numpy
+import ws2812
+
+SHM = "/dev/shm/ws2812-fb" if os.path.isdir("/dev/shm") else "/tmp/ws2812-fb"
+CONTROL = "/tmp/ws2812-fb.sock"
+MAGIC = b"WS28"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")
+
+MSG_READY = b"F"
+MSG_CLEAR = b"C"
+MSG_QUIT = b"Q"
+
+#permissions of the framebuffer file and the control socket
+MODE = 0o660
+
+def _map(path, nLED=None, mode=MODE):
+  #open (and with nLED, create) the framebuffer file; returns (mmap, nLED)
+  if nLED is not None:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, mode)
+    #the umask applies to O_CREAT and an old file keeps its mode
+    os.fchmod(fd, mode)
+    os.ftruncate(fd, HEADER.size + nLED*3)
+  else:
+    fd = os.open(path, os.O_RDWR)
+  try:
+    size = os.fstat(fd).st_size
+    mm = mmap.mmap(fd, size)
+  finally:
+    os.close(fd)
+  if nLED is not None:
+    HEADER.pack_into(mm, 0, MAGIC, VERSION, nLED, 0)
+  magic, version, nLED, _ = HEADER.unpack_from(mm, 0)
+  if magic != MAGIC or version != VERSION:
+    raise ValueError("%s is not a ws2812 framebuffer" % path)
+  return mm, nLED
+
+class FrameBuffer(object):
+  """Producer side: a numpy view on the daemon's shared frame."""
+  def __init__(self, path=SHM, control=CONTROL):
+    self._mm, self.nLED = _map(path)
+    self.frame = numpy.frombuffer(self._mm, dtype=numpy.uint8, count=self.nLED*3,
+                                  offset=HEADER.size).reshape(self.nLED, 3)
+    self.control = control
+    self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+  def _send(self, msg):
+    try:
+      self._sock.sendto(msg, self.control)
+    except (socket.error, OSError):
+      #daemon not running (yet): the pixels stay in the mapping
+      pass
+
+  def ready(self):
+    """Tell the daemon the frame is complete."""
+    self._send(MSG_READY)
+
+  def clear(self):
+    self.frame.fill(0)
+    self._send(MSG_CLEAR)
+
+  def close(self):
+    self._sock.close()
+    del self.frame
+    self._mm.close()
+
+class FrameBufferDaemon(object):
+  """Owns the strip; shows the shared frame whenever a producer is ready."""
+  def __init__(self, strip, path=SHM, control=CONTROL, fps=60, mode=MODE):
+    self.strip = strip
+    self.path = path
+    self.control = control
+    self.period = 1.0/fps
+    if not strip.arrays:
+      raise ValueError("the framebuffer daemon needs a numpy backed Strip")
+    self._mm, nLED = _map(path, strip.nLED, mode)
+    #encode straight from the shared mapping
+    strip.frame = numpy.frombuffer(self._mm, dtype=numpy.uint8, count=nLED*3,
+                                   offset=HEADER.size).reshape(nLED, 3)
+    if os.path.exists(control):
+      os.unlink(control)
+    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    self.sock.bind(control)
+    os.chmod(control, mode)
+    self.frames = 0
+    self._lastShow = 0.0
+    self._running = False
+
+  def _show(self):
+    #rate limit to fps, then encode from the mapping
+    wait = self._lastShow + self.period - time.monotonic()
+    if wait > 0:
+      time.sleep(wait)
+      self._drain()
+    self.strip.show()
+    self._lastShow = time.monotonic()
+    self.frames += 1
+    HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self.strip.nLED, self.frames & 0xffffffff)
+
+  def _drain(self):
+    #ready messages that arrived while waiting are covered by this frame
+    self.sock.setblocking(False)
+    try:
+      while True:
+        msg = self.sock.recv(16)
+        if msg == MSG_CLEAR:
+          self.strip.frame.fill(0)
+        elif msg == MSG_QUIT:
+          self._running = False
+    except (socket.error, OSError):
+      pass
+    finally:
+      self.sock.setblocking(True)
+
+  def poll(self, timeout=None):
+    """Handle one control message; returns True if a frame was shown."""
+    self.sock.settimeout(timeout)
+    try:
+      msg = self.sock.recv(16)
+    except socket.timeout:
+      return False
+    if msg == MSG_READY:
+      self._show()
+      return True
+    if msg == MSG_CLEAR:
+      self.strip.frame.fill(0)
+      self._show()
+      return True
+    if msg == MSG_QUIT:
+      self._running = False
+    return False
+
+  def serve(self):
+    self._running = True
+    while self._running:
+      self.poll()
+
+  def close(self):
+    self.sock.close()
+    if os.path.exists(self.control):
+      os.unlink(self.control)
+    if self._mm is not None:
+      #the strip keeps its own copy so the mapping can be released
+      self.strip.frame = self.strip.frame.copy()
+      self._mm.close()
+      self._mm = None
+      if os.path.exists(self.path):
+        os.unlink(self.path)
+
+def usage():
+  print("Usage:")
+  print("-h", "--help")
+  print("-n", "--nLED", "default=150")
+  print("-s", "--SPI", "default=0")
+  print("-f", "--fps", "default=60")
+  print("-b", "--bits", "default=4")
+  print("-m", "--mode", "framebuffer and socket permissions, default=0660")
+
+if __name__=="__main__":
+  import spidev
+  try:
+    opts, args = getopt.getopt(sys.argv[1:], "hn:s:f:b:m:", ["help", "nLED=", "SPI=", "fps=", "bits=", "mode="])
+  except getopt.GetoptError as err:
+    print(str(err))
+    usage()
+    sys.exit(2)
+  nLED=150
+  nSPI=0
+  fps=60
+  bits=4
+  mode=MODE
+  for o, a in opts:
+    if o in ("-h", "--help"):
+      usage()
+      sys.exit()
+    elif o in ("-n", "--nLED"):
+      nLED=int(a)
+    elif o in ("-s", "--SPI"):
+      nSPI=int(a)
+    elif o in ("-f", "--fps"):
+      fps=float(a)
+    elif o in ("-b", "--bits"):
+      bits=int(a)
+    elif o in ("-m", "--mode"):
+      mode=int(a, 8)
+
+  spi = spidev.SpiDev()
+  spi.open(nSPI, 0)
+  strip = ws2812.Strip(spi, nLED, bits, fps=fps)
+  daemon = FrameBufferDaemon(strip, fps=fps, mode=mode)
+  print("Framebuffer %s, control %s" % (daemon.path, daemon.control))
+  try:
+    daemon.serve()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    strip.clear()
+    daemon.close()
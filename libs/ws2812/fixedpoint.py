@@ -0,0 +1,210 @@
+"""
+Fixed-point effect kernels for boards without a fast FPU.
+
+Phases are uint16 accumulators: 65536 is one turn and the wrap is free.
+Waveforms and palettes are tables of SIZE entries indexed by the top
+TABLE_BITS of the phase and built once per (waveform, amplitude), so a
+frame is a uint16 add, a shift and a table gather over all channels at
+once - no sin() and no float per pixel. Per-pixel phase offsets are
+computed once per strip length.
+
+plasma, audio_plasma, rainbow and wave take the same arguments as
+effects.plasma, effects.audio_plasma, effects.rainbow and the wave.py
+pattern and stay within 1 of them on every channel, so they are a
+drop-in:
+
+  import fixedpoint
+  fixedpoint.plasma(strip.frame, t)
+
+The building blocks work on phases directly:
+
+  osc = fixedpoint.Accumulator(0.5, fps=50)        #0.5 turns/s
+  offsets = fixedpoint.offsets(nLED, 2./nLED)      #two waves along the strip
+  levels = fixedpoint.level_table(255, fixedpoint.TRIANGLE)
+  for t in frameclock.FrameClock(50):
+    fixedpoint.sine(strip.frame[:, 0], offsets, osc.next(), levels)
+
+python bench.py -e compares them with the float versions.
+"""
+import numpy
+import effects
+
+PHASE_BITS = 16
+TABLE_BITS = 12
+PHASE = 1 << PHASE_BITS
+MASK = PHASE - 1
+SIZE = 1 << TABLE_BITS
+SHIFT = PHASE_BITS - TABLE_BITS
+TAU = 2*numpy.pi
+
+#waveforms -1..1 over one turn, only used to build the tables
+_turn = numpy.arange(SIZE)/float(SIZE)
+SINE = numpy.sin(TAU*_turn)
+TRIANGLE = 1 - 4*numpy.abs((_turn + 0.25) % 1.0 - 0.5)
+
+def turns(x):
+  """Turns (float or array) -> uint16 phase, rounded and wrapped."""
+  if numpy.ndim(x):
+    return (numpy.round(numpy.asarray(x, dtype=numpy.float64)*PHASE) % PHASE).astype(numpy.uint16)
+  return int(round(x*PHASE)) & MASK
+
+def radians(x):
+  return turns(x/TAU)
+
+class Accumulator(object):
+  """uint16 phase advancing rate turns per second at fps frames per second."""
+  def __init__(self, rate, fps, phase=0):
+    self.step = turns(rate/float(fps))
+    self.phase = phase & MASK
+
+  def next(self):
+    self.phase = (self.phase + self.step) & MASK
+    return self.phase
+
+_offset_cache = {}
+
+def offsets(n, step):
+  """Phase of pixel i = i*step turns, for n pixels; shared between calls."""
+  key = (n, step)
+  off = _offset_cache.get(key)
+  if off is None:
+    off = _offset_cache[key] = turns(numpy.arange(n)*step)
+  return off
+
+_scratch_cache = {}
+
+def _scratch(shape):
+  #phase, table index and product buffers for a frame (or channel) shape
+  buf = _scratch_cache.get(shape)
+  if buf is None:
+    buf = _scratch_cache[shape] = (numpy.empty(shape, dtype=numpy.uint16),
+                                   numpy.empty(shape, dtype=numpy.intp),
+                                   numpy.empty(shape, dtype=numpy.int64))
+  return buf
+
+def _index(shape, offsets, phase):
+  #table index of every pixel: (offset + phase) >> SHIFT
+  p, idx, _ = _scratch(shape)
+  numpy.add(offsets, numpy.asarray(phase, dtype=numpy.uint16), out=p)
+  numpy.right_shift(p, SHIFT, out=idx)
+  return idx
+
+def _phases(*phases):
+  #per channel phases, broadcast against (n, 3) offsets
+  return numpy.array(phases, dtype=numpy.uint16)
+
+_level_cache = {}
+LEVEL_CACHE = 16
+
+def level_table(amplitude=255, wave=SINE):
+  """
+  uint8 table of wave mapped from -1..1 to 0..amplitude, clamped and
+  truncated like effects.py; cached for the last LEVEL_CACHE amplitudes.
+  """
+  key = (id(wave), amplitude)
+  hit = _level_cache.get(key)
+  if hit is not None:
+    return hit[1]
+  f = wave + 1
+  f *= amplitude/2.
+  table = numpy.empty(SIZE, dtype=numpy.uint8)
+  effects._store(table, f)
+  if len(_level_cache) >= LEVEL_CACHE:
+    del _level_cache[next(iter(_level_cache))]
+  #keep wave alive so its id is not reused while cached
+  _level_cache[key] = (wave, table)
+  return table
+
+_unit_cache = {}
+
+def _unit(wave):
+  #(wave+1)/2 as Q15 integers, for amplitudes that change every frame
+  hit = _unit_cache.get(id(wave))
+  if hit is None:
+    hit = _unit_cache[id(wave)] = (wave, numpy.round((wave + 1)*(1 << 14)).astype(numpy.int64))
+  return hit[1]
+
+def sine(out, offsets, phase, table):
+  """
+  out = table[(offsets + phase) >> SHIFT]: one add and one gather.
+  offsets and phase broadcast against out, so a whole (n, 3) frame with
+  (n, 3) or (n, 1) offsets and a phase per channel is a single call.
+  """
+  numpy.take(table, _index(out.shape, offsets, phase), out=out, mode="clip")
+
+def sine_scaled(out, offsets, phase, amplitude, wave=SINE):
+  """
+  sine() with an amplitude that changes every frame: the Q15 wave times
+  the amplitude in Q8 (an integer multiply) instead of a table per
+  amplitude.
+  """
+  acc = _scratch(out.shape)[2]
+  numpy.take(_unit(wave), _index(out.shape, offsets, phase), out=acc, mode="clip")
+  acc *= int(round(amplitude*256))
+  numpy.right_shift(acc, 23, out=acc)
+  numpy.clip(acc, 0, 255, out=acc)
+  out[...] = acc
+
+def palette_table(colors, size=SIZE):
+  """
+  (size, 3) uint8 table running through the RGB stops in colors and back
+  to the first one, for palette().
+  """
+  colors = numpy.asarray(colors, dtype=numpy.float64)
+  stops = numpy.arange(len(colors) + 1)*(size/float(len(colors)))
+  x = numpy.arange(size)
+  table = numpy.empty((size, 3), dtype=numpy.uint8)
+  ring = numpy.concatenate((colors, colors[:1]))
+  for c in range(3):
+    table[:, c] = numpy.interp(x, stops, ring[:, c])
+  return table
+
+_hue_cache = {}
+
+def hue_table(brightness=255):
+  """(SIZE, 3) hue wheel at brightness, as effects.rainbow draws it."""
+  table = _hue_cache.get(brightness)
+  if table is None:
+    table = _hue_cache[brightness] = numpy.empty((SIZE, 3), dtype=numpy.uint8)
+    effects._store(table, effects.hsv_to_rgb(_turn, 1.0, brightness))
+  return table
+
+def palette(out, offsets, phase, table):
+  """out[i] = table[(offsets[i] + phase) >> SHIFT] for a (SIZE, 3) table."""
+  numpy.take(table, _index(out.shape[:1], offsets, phase), axis=0, out=out, mode="clip")
+
+_plasma_cache = {}
+
+def _plasma_offsets(n, p1, p2):
+  #(n, 3) offsets: i/p1 for red and green, i/p2 for blue (radians)
+  key = (n, p1, p2)
+  off = _plasma_cache.get(key)
+  if off is None:
+    off = _plasma_cache[key] = numpy.empty((n, 3), dtype=numpy.uint16)
+    off[:, 0] = off[:, 1] = offsets(n, 1/(p1*TAU))
+    off[:, 2] = offsets(n, 1/(p2*TAU))
+  return off
+
+def plasma(out, m, amplitude=255, p1=7., p2=5.):
+  """effects.plasma in fixed point."""
+  sine(out, _plasma_offsets(len(out), p1, p2), _phases(radians(m), radians(-m), radians(m*3.5)),
+       level_table(amplitude))
+
+def audio_plasma(out, m, peak, gain=1/50., offset=-35, p1=7., p2=5.):
+  """effects.audio_plasma in fixed point."""
+  sine_scaled(out, _plasma_offsets(len(out), p1, p2),
+              _phases(radians(m), radians(-m), radians(m*3.5)), peak*gain + offset)
+
+def rainbow(out, t, brightness=255):
+  """effects.rainbow in fixed point."""
+  n = len(out)
+  palette(out, offsets(n, 1./n), turns(t % 1.0), hue_table(brightness))
+
+def wave(out, t, periods=(2, 2.1, 2.2), intensity=20):
+  """
+  The wave.py test pattern: channel c is sin(-2*pi*t/periods[c] +
+  4*pi*i/n), two waves along the strip, scaled to 0..intensity.
+  """
+  n = len(out)
+  sine(out, offsets(n, 2./n)[:, None], _phases(*[turns(-(t/period) % 1.0) for period in periods]),
+       level_table(intensity))
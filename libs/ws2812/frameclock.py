@@ -0,0 +1,87 @@
+"""
+Deadline based frame clock.
+
+Frames are scheduled on a fixed grid start + k/fps measured with the
+monotonic clock, so render and SPI time are absorbed by the sleep
+instead of being added to it. Frames whose deadline has already passed
+by a whole period are skipped rather than rendered late.
+
+sleep may wait on something else as well (e.g. select() on a socket)
+and return True when it woke up early: that frame then goes out at
+once and the grid moves with it.
+
+  clock = FrameClock(50)
+  for t in clock:
+    effects.plasma(strip.frame, t)
+    strip.show()
+"""
+import time
+
+try:
+  monotonic = time.monotonic
+except AttributeError:
+  monotonic = time.time
+
+class FrameClock(object):
+  def __init__(self, fps, sleep=time.sleep, now=monotonic):
+    self.fps = float(fps)
+    self.period = 1.0/self.fps
+    self._sleep = sleep
+    self._now = now
+    self.stats = None   #stats.Stats counting dropped and late frames
+    self.reset()
+
+  def reset(self):
+    self.start = self._now()
+    self.offset = 0.0   #timestamp of frame 0 of the current grid
+    self.frame = 0      #index of the next frame on the grid
+    self.dropped = 0    #frames skipped because we were late
+    self.late = 0       #times we fell a whole frame behind
+
+  def tick(self):
+    """
+    Wait for the next frame deadline and return its timestamp in
+    seconds since start. The timestamp is the ideal grid time, not the
+    wake-up time, so animations advance at exactly fps.
+    """
+    deadline = self.start + self.frame*self.period
+    now = self._now()
+    if now < deadline:
+      if self._sleep(deadline - now):
+        #woken early: move the grid so this frame is due now
+        early = deadline - self._now()
+        if early > 0:
+          self.start -= early
+          self.offset -= early
+    elif now - deadline >= self.period:
+      #more than a frame behind: jump to the most recent grid point
+      behind = int((now - self.start)*self.fps) - self.frame
+      self.dropped += behind
+      self.frame += behind
+      self.late += 1
+      if self.stats is not None:
+        self.stats.count("dropped", behind)
+        self.stats.count("late")
+    t = self.offset + self.frame*self.period
+    self.frame += 1
+    return t
+
+  def set_fps(self, fps):
+    """
+    Change the rate from the next frame on, e.g. to idle slowly while
+    the strip shows a static frame. Timestamps continue without a jump.
+    """
+    fps = float(fps)
+    if fps == self.fps:
+      return
+    #rebase the grid on the last frame returned, one new period after it
+    last = max(self.frame-1, 0)
+    self.start += last*self.period
+    self.offset += last*self.period
+    self.frame = min(self.frame, 1)
+    self.fps = fps
+    self.period = 1.0/fps
+
+  def __iter__(self):
+    while True:
+      yield self.tick()
@@ -0,0 +1,12 @@
+"""Plasma plugin for fxdaemon.py (mood.py)."""
+import effects
+
+class Effect(object):
+  needsAudio = False
+
+  def __init__(self, nLED, audio=None, velocity=10, brightness=255):
+    self.velocity = velocity
+    self.brightness = brightness
+
+  def render(self, frame, t):
+    effects.plasma(frame, t / self.velocity * 10, self.brightness)
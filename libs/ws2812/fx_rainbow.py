@@ -0,0 +1,12 @@
+"""Rainbow plugin for fxdaemon.py (rainbow.py)."""
+import effects
+
+class Effect(object):
+  needsAudio = False
+
+  def __init__(self, nLED, audio=None, velocity=10, brightness=255):
+    self.velocity = velocity
+    self.brightness = brightness
+
+  def render(self, frame, t):
+    effects.rainbow(frame, t / self.velocity, self.brightness)
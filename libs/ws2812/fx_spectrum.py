@@ -0,0 +1,13 @@
+"""Spectrum plugin for fxdaemon.py (vuspectrum.py)."""
+import effects, spectrum
+
+class Effect(object):
+  needsAudio = True
+
+  def __init__(self, nLED, audio=None, bands=30, fmin=40):
+    self.audio = audio
+    self.analyzer = spectrum.SpectrumAnalyzer(audio.window, audio.rate, nBands=int(bands), fmin=fmin)
+
+  def render(self, frame, t):
+    self.analyzer.process(self.audio.latest())
+    effects.spectrum(frame, self.analyzer.level)
@@ -0,0 +1,15 @@
+"""Peak meter plugin for fxdaemon.py (vumeter.py)."""
+import numpy
+
+class Effect(object):
+  needsAudio = True
+
+  def __init__(self, nLED, audio=None, scale=200, color=(100, 0, 0)):
+    self.audio = audio
+    self.scale = scale
+    self.color = color
+
+  def render(self, frame, t):
+    peak = numpy.amax(numpy.abs(self.audio.latest()))
+    frame.fill(0)
+    frame[0:int(peak/self.scale)] = self.color
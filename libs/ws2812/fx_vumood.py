@@ -0,0 +1,39 @@
+"""Bass colour plugin for fxdaemon.py (vumood.py)."""
+import colorsys
+import spectrum
+
+class Effect(object):
+  needsAudio = True
+
+  def __init__(self, nLED, audio=None, threshold=100, minDiff=1, smoothing=None):
+    self.audio = audio
+    self.analyzer = spectrum.SpectrumAnalyzer(audio.window, audio.rate, edges=(20, 200, 1000))
+    self.threshold = threshold
+    self.minDiff = minDiff
+    if smoothing is None:
+      #vumood.py: 0.3 per window length, applied once per hop
+      smoothing = 1 - (1 - 0.3) ** (audio.hop / float(audio.window))
+    self.smoothing = smoothing
+    self.smoothed = 0
+    self.color = (0, 0, 0)
+    self.hops = audio.written // audio.hop
+
+  def update(self, steps):
+    bass, mid = self.analyzer.process(self.audio.latest())
+    if bass > self.threshold and bass - mid > self.minDiff:
+      strength = min((bass - self.threshold) / 20, 1.0)
+      #steps smoothing steps towards strength in one go
+      self.smoothed += (1 - (1 - self.smoothing)**steps)*(strength - self.smoothed)
+      r, g, b = colorsys.hls_to_rgb(0.66 - 0.66*self.smoothed, 0.5, 1.0)
+      self.color = (int(r*255), int(g*255), int(b*255))
+    else:
+      self.smoothed = 0
+      self.color = (0, 0, 0)
+
+  def render(self, frame, t):
+    #smooth once per new audio window like vumood.py, not once per frame
+    hops = self.audio.written // self.audio.hop
+    if hops != self.hops:
+      steps, self.hops = hops - self.hops, hops
+      self.update(steps)
+    frame[:] = self.color
@@ -0,0 +1,288 @@
+#!/usr/bin/python
+"""
+Long-running effect daemon with hot-swappable plugin effects.
+
+The daemon opens the strip once, renders the active effect on a
+FrameClock and switches effects on a control command in a few
+milliseconds, optionally crossfading, instead of restarting a script.
+The audio stream (and with it pyaudio) is only opened the first time an
+audio effect is activated, and then stays open.
+
+Effects are plugins: an fx_<name>.py module next to this one, whose
+import has no side effects and which defines
+
+  class Effect(object):
+    needsAudio = False             #True: gets the AudioInput
+    def __init__(self, nLED, audio=None, **params): ...
+    def render(self, frame, t): ...  #draw into the (nLED, 3) frame
+
+"rainbow" loads fx_rainbow.py from this directory; nothing else can be
+loaded through the control socket. Switching reloads the module, so an
+edited plugin is picked up without restarting. A plugin
+that fails to load keeps the current effect; one that raises while
+rendering is replaced by the effect before it (or off).
+
+  python fxdaemon.py -n 90 -s 1 -e rainbow
+  python fxdaemon.py -c "mood fade=2 velocity=5"
+  python fxdaemon.py -c vumood
+  python fxdaemon.py -c off
+
+Commands are datagrams on a Unix socket: an effect name followed by
+key=value parameters (fade is the crossfade in seconds), "off" or
+"quit". The socket is created with mode 0660, so only the daemon's
+user or group can send them (-m changes it).
+
+When the strip skips unchanged frames (Strip.set_refresh, on from the
+command line), the daemon drops to idleFps after a second of identical
+frames, e.g. while "off". While idle it waits on the control socket, so
+a command is still handled at once and brings back the full rate.
+"""
+import importlib.util, os, re, select, socket, sys, time, getopt
+import ws2812, frameclock, compositor
+
+CONTROL = "/tmp/ws2812-fx.sock"
+#permissions of the control socket
+MODE = 0o660
+#plugins are only loaded from here
+PLUGINS = os.path.dirname(os.path.abspath(__file__))
+
+def load_effect(name):
+  """(Re)load plugin fx_<name>.py from PLUGINS and return its Effect class."""
+  if not re.match(r"^[A-Za-z0-9_]+$", name):
+    raise ValueError("bad effect name %r" % (name,))
+  module = name if name.startswith("fx_") else "fx_" + name
+  path = os.path.join(PLUGINS, module + ".py")
+  if not os.path.isfile(path):
+    raise ValueError("no effect %r in %s" % (name, PLUGINS))
+  #from the file itself, not whatever sys.path finds first
+  spec = importlib.util.spec_from_file_location(module, path)
+  mod = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(mod)
+  sys.modules[module] = mod
+  return mod.Effect
+
+def parse_command(command):
+  """'mood fade=2 velocity=5' -> ('mood', {'fade': 2.0, 'velocity': 5.0})"""
+  words = command.split()
+  params = {}
+  for word in words[1:]:
+    key, _, value = word.partition("=")
+    try:
+      params[key] = float(value)
+    except ValueError:
+      params[key] = value
+  return (words[0] if words else ""), params
+
+def send(command, control=CONTROL):
+  """Send a command to a running daemon."""
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+  try:
+    sock.sendto(command.encode("utf-8"), control)
+  finally:
+    sock.close()
+
+class EffectDaemon(object):
+  def __init__(self, strip, fps=50, control=CONTROL, rate=44100, window=2048, hop=512,
+               idleFps=5, mode=MODE):
+    if not strip.arrays:
+      raise ValueError("the effect daemon needs a numpy backed Strip")
+    self.strip = strip
+    self.fps = fps
+    self.idleFps = idleFps
+    self.clock = frameclock.FrameClock(fps, sleep=self._wait)
+    self.control = control
+    self.audioConfig = (rate, window, hop)
+    self.audio = None
+    self.effect = None
+    self.name = None
+    self._previous = (None, None)   #fallback if the effect fails to render
+    self._mixer = compositor.Compositor(strip.nLED)
+    self._old = self._mixer.add()
+    self._new = self._mixer.add()
+    self._fading = None
+    self._fadeStart = None
+    self._fadeTime = 0.0
+    self._running = False
+    if os.path.exists(control):
+      os.unlink(control)
+    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    self.sock.bind(control)
+    self.sock.setblocking(False)
+    os.chmod(control, mode)
+
+  def _open_audio(self):
+    if self.audio is None:
+      import audioinput
+      rate, window, hop = self.audioConfig
+      self.audio = audioinput.AudioInput(rate, window=window, hop=hop).start()
+    return self.audio
+
+  def switch(self, name, fade=0, **params):
+    """Activate effect `name` (None or "off" for black), crossfading for fade seconds."""
+    if name in (None, "off"):
+      effect = None
+    else:
+      cls = load_effect(name)
+      audio = self._open_audio() if getattr(cls, "needsAudio", False) else None
+      effect = cls(self.strip.nLED, audio=audio, **params)
+    if fade > 0 and self.effect is not effect:
+      self._fading = self.effect
+      self._fadeStart = None   #set by the first frame of the fade
+      self._fadeTime = float(fade)
+    else:
+      self._fading = None
+    self._previous = (self.effect, self.name)
+    self.effect = effect
+    self.name = name
+    return effect
+
+  def command(self, command):
+    name, params = parse_command(command)
+    if name == "quit":
+      self._running = False
+    elif name:
+      fade = params.pop("fade", 0)
+      try:
+        self.switch(name, fade, **params)
+      except Exception as err:
+        #a broken plugin must not take the strip down
+        print("Warning: cannot switch to %r: %s" % (command, err))
+
+  def poll(self):
+    """Handle pending control commands without blocking; returns how many."""
+    n = 0
+    while True:
+      try:
+        msg = self.sock.recv(1024)
+      except (socket.error, OSError):
+        return n
+      self.command(msg.decode("utf-8", "replace"))
+      n += 1
+
+  def _wait(self, seconds):
+    #clock sleep; while idle a control command ends it early
+    if self.clock.fps == self.fps:
+      time.sleep(seconds)
+      return False
+    return bool(select.select([self.sock], [], [], seconds)[0])
+
+  def _render(self, effect, frame, t):
+    if effect is None:
+      frame.fill(0)
+      return
+    try:
+      effect.render(frame, t)
+    except Exception as err:
+      #a broken plugin must not take the strip down either
+      frame.fill(0)
+      self._drop(effect, err)
+
+  def _drop(self, effect, err):
+    if effect is self._fading:
+      print("Warning: effect fading out failed: %s" % err)
+      self._fading = None
+    if effect is self.effect:
+      previous, name = self._previous
+      if previous is effect:
+        previous, name = None, None
+      print("Warning: effect %r failed: %s; back to %s" % (self.name, err, name or "off"))
+      self._fading = None
+      self._previous = (None, None)
+      self.effect, self.name = previous, name
+
+  def render(self, t):
+    """Draw the frame at time t into strip.frame."""
+    frame = self.strip.frame
+    if self._fading is not None:
+      if self._fadeStart is None:
+        self._fadeStart = t
+      x = (t - self._fadeStart)/self._fadeTime
+      if x >= 1:
+        self._fading = None
+      else:
+        self._render(self._fading, self._old.frame, t)
+        self._render(self.effect, self._new.frame, t)
+        self._new.opacity = x
+        self._mixer.flatten(frame)
+        return
+    self._render(self.effect, frame, t)
+
+  def serve(self):
+    self._running = True
+    for t in self.clock:
+      if self.poll():
+        self.clock.set_fps(self.fps)
+      if not self._running:
+        break
+      self.render(t)
+      self.strip.show()
+      if self.strip.skip:
+        self.clock.set_fps(self.idleFps if self.strip.unchanged > self.fps else self.fps)
+
+  def close(self):
+    if self.audio is not None:
+      self.audio.close()
+    self.sock.close()
+    if os.path.exists(self.control):
+      os.unlink(self.control)
+
+def usage():
+  print("Usage:")
+  print("-h", "--help")
+  print("-n", "--nLED", "default=90")
+  print("-s", "--SPI", "default=0")
+  print("-f", "--fps", "default=50")
+  print("-b", "--bits", "default=4")
+  print("-e", "--effect", "effect to start with, default=off")
+  print("-c", "--command", "send a command to the running daemon and exit")
+  print("-m", "--mode", "control socket permissions, default=0660")
+
+if __name__=="__main__":
+  try:
+    opts, args = getopt.getopt(sys.argv[1:], "hn:s:f:b:e:c:m:", ["help", "nLED=", "SPI=", "fps=", "bits=", "effect=", "command=",
+                                                            "mode="])
+  except getopt.GetoptError as err:
+    print(str(err))
+    usage()
+    sys.exit(2)
+  nLED=90
+  nSPI=0
+  fps=50
+  bits=4
+  effect="off"
+  mode=MODE
+  for o, a in opts:
+    if o in ("-h", "--help"):
+      usage()
+      sys.exit()
+    elif o in ("-n", "--nLED"):
+      nLED=int(a)
+    elif o in ("-s", "--SPI"):
+      nSPI=int(a)
+    elif o in ("-f", "--fps"):
+      fps=float(a)
+    elif o in ("-b", "--bits"):
+      bits=int(a)
+    elif o in ("-e", "--effect"):
+      effect=a
+    elif o in ("-c", "--command"):
+      send(a)
+      sys.exit()
+    elif o in ("-m", "--mode"):
+      mode=int(a, 8)
+
+  import spidev
+  spi = spidev.SpiDev()
+  spi.open(nSPI, 0)
+  strip = ws2812.Strip(spi, nLED, bits, fps=fps)
+  strip.set_refresh(keepalive=1.0)
+  daemon = EffectDaemon(strip, fps=fps, mode=mode)
+  daemon.command(effect)
+  print("Control %s" % daemon.control)
+  try:
+    daemon.serve()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    strip.clear()
+    daemon.close()
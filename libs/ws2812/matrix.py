@@ -0,0 +1,85 @@
+"""
+2D layout of a strip wired as a matrix.
+
+Effects render into a logical (height, width, 3) frame where [y, x] is
+the pixel y rows down and x columns across, whatever the wiring. Matrix
+works out once which logical pixel every LED on the wire shows: rows or
+columns, serpentine or not, panels rotated or mirrored and tiled into a
+bigger display. Strip.set_layout() then applies it (together with the
+channel order) as one gather at encode time.
+
+  m = matrix.Matrix(8, 8, serpentine=True, panels=(4, 1))   #32x8
+  strip = ws2812.Strip(spi, m.nLED)
+  strip.set_layout(m)
+  strip.frame[m.r < 3] = (255, 0, 0)        #strip.frame is (8, 32, 3)
+  strip.show()
+
+Coordinate grids (x, y) and polar coordinates around the centre (r,
+theta) are precomputed as (height, width) arrays.
+"""
+import numpy
+
+class Matrix(object):
+  """
+  width, height: size of one panel as mounted, in pixels
+  serpentine:    every other row (column) runs backwards
+  columns:       LEDs run down columns instead of along rows
+  rotate:        panel mounted rotated by 0, 90, 180 or 270 degrees
+                 counterclockwise relative to the wiring described above
+  mirror:        panel mounted flipped left to right
+  panels:        (across, down) panels, chained row by row in the
+                 same orientation; panelSerpentine reverses every
+                 other row of panels
+  """
+  def __init__(self, width, height, serpentine=False, columns=False, rotate=0, mirror=False,
+               panels=(1, 1), panelSerpentine=False):
+    if rotate % 90:
+      raise ValueError("rotate must be a multiple of 90, got %r" % (rotate,))
+    across, down = panels
+    self.width = width*across
+    self.height = height*down
+    self.shape = (self.height, self.width)
+    self.nLED = self.width*self.height
+
+    #wiring of one panel: wire index at each position before mounting
+    turns = rotate//90 % 4
+    rows, cols = (height, width) if turns % 2 == 0 else (width, height)
+    if columns:
+      wire = numpy.arange(rows*cols).reshape(cols, rows)
+      if serpentine:
+        wire[1::2] = wire[1::2, ::-1]
+      wire = wire.T
+    else:
+      wire = numpy.arange(rows*cols).reshape(rows, cols)
+      if serpentine:
+        wire[1::2] = wire[1::2, ::-1]
+    if mirror:
+      wire = wire[:, ::-1]
+    panel = numpy.rot90(wire, turns)
+
+    #tile panels; grid[y, x] is the wire index of logical pixel (x, y)
+    grid = numpy.zeros(self.shape, dtype=numpy.intp)
+    size = width*height
+    for py in range(down):
+      order = range(across)
+      if panelSerpentine and py % 2:
+        order = reversed(order)
+      for n, px in enumerate(order):
+        grid[py*height:(py+1)*height, px*width:(px+1)*width] = panel + (py*across+n)*size
+    self.grid = grid
+    #index[k] is the flat logical pixel LED k shows
+    self.index = numpy.argsort(grid.reshape(-1))
+
+    self.y, self.x = numpy.indices(self.shape, dtype=float)
+    self.cx = (self.width-1)/2.
+    self.cy = (self.height-1)/2.
+    self.r = numpy.hypot(self.x-self.cx, self.y-self.cy)
+    self.theta = numpy.arctan2(self.y-self.cy, self.x-self.cx)
+
+  def frame(self):
+    """A new logical (height, width, 3) uint8 frame."""
+    return numpy.zeros(self.shape + (3,), dtype=numpy.uint8)
+
+  def to_wire(self, frame):
+    """Logical frame -> (nLED, 3) in wire order (Strip does this itself)."""
+    return frame.reshape(-1, 3)[self.index]
@@ -0,0 +1,129 @@
+"""
+One logical strip spread over several SPI devices.
+
+A segment maps a range of the logical frame onto a physical strip:
+
+  segments = [Segment(0,   150, bus=0, cs=0),
+              Segment(150, 150, bus=1, cs=0, reversed=True),
+              Segment(300,  60, bus=1, cs=1, offset=10)]
+  strip = MultiStrip(segments)
+  effects.rainbow(strip.frame, t)
+  strip.show()
+
+Every bus gets its own writer thread, so all buses are encoded and
+clocked out at the same time and the frame time follows the longest
+bus instead of the total LED count. Devices sharing a bus (different
+chip selects) are sent one after the other by that bus's thread. If a
+bus fails, show() raises its exception (and keeps raising it) instead
+of waiting for that bus.
+"""
+import threading
+from collections import namedtuple
+import numpy
+import ws2812
+
+class Segment(namedtuple("Segment", "start count bus cs offset reversed")):
+  """
+  start, count: pixel range in the logical frame
+  bus, cs:      spidev device (/dev/spidev<bus>.<cs>)
+  offset:       first physical pixel of the range on that device
+  reversed:     the physical strip runs backwards
+  """
+  def __new__(cls, start, count, bus, cs=0, offset=0, reversed=False):
+    return super(Segment, cls).__new__(cls, start, count, bus, cs, offset, reversed)
+
+def open_spidev(bus, cs):
+  import spidev
+  spi = spidev.SpiDev()
+  spi.open(bus, cs)
+  return spi
+
+class MultiStrip(object):
+  def __init__(self, segments, bits=4, openSpi=open_spidev, **output):
+    self.segments = [Segment(*s) for s in segments]
+    self.nLED = max(s.start+s.count for s in self.segments)
+    self.frame = numpy.zeros((self.nLED, 3), dtype=numpy.uint8)
+
+    #one Strip per (bus, cs), long enough for every segment on it
+    lengths = {}
+    for s in self.segments:
+      key = (s.bus, s.cs)
+      lengths[key] = max(lengths.get(key, 0), s.offset+s.count)
+    self.strips = {}
+    for key in sorted(lengths):
+      strip = self.strips[key] = ws2812.Strip(openSpi(*key), lengths[key], bits, **output)
+      if not strip.arrays:
+        raise ValueError("MultiStrip needs numpy backed Strips, got backend %r"
+                         % strip.backend.name)
+    self._copies = []
+    for s in self.segments:
+      src = self.frame[s.start:s.start+s.count]
+      if s.reversed:
+        src = src[::-1]
+      dst = self.strips[(s.bus, s.cs)].frame[s.offset:s.offset+s.count]
+      self._copies.append((dst, src))
+
+    buses = sorted(set(bus for bus, cs in self.strips))
+    self._running = True
+    self._error = None
+    self._start = threading.Barrier(len(buses)+1)
+    self._done = threading.Barrier(len(buses)+1)
+    self._threads = []
+    for bus in buses:
+      strips = [self.strips[key] for key in sorted(self.strips) if key[0] == bus]
+      thread = threading.Thread(target=self._run, args=(strips,),
+                                name="ws2812-bus%d" % bus)
+      thread.daemon = True
+      thread.start()
+      self._threads.append(thread)
+
+  def _run(self, strips):
+    try:
+      while True:
+        self._start.wait()
+        if not self._running:
+          return
+        for strip in strips:
+          strip._write(strip.encode())
+        self._done.wait()
+    except threading.BrokenBarrierError:
+      pass
+    except Exception as err:
+      #hand the error to show() instead of leaving it waiting for this bus
+      self._error = err
+      self._start.abort()
+      self._done.abort()
+
+  def _check(self):
+    if self._error is not None:
+      raise self._error
+
+  def set_output(self, **output):
+    for strip in self.strips.values():
+      strip.set_output(**output)
+
+  def show(self, data=None):
+    if data is not None:
+      self.frame[...] = data
+    self._check()
+    for dst, src in self._copies:
+      dst[...] = src
+    try:
+      self._start.wait()
+      self._done.wait()
+    except threading.BrokenBarrierError:
+      self._check()
+      raise
+
+  def clear(self):
+    self.frame.fill(0)
+    self.show()
+
+  def close(self):
+    self._running = False
+    try:
+      self._start.wait()
+    except threading.BrokenBarrierError:
+      pass
+    for thread in self._threads:
+      thread.join()
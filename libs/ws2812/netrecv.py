@@ -0,0 +1,224 @@
+#!/usr/bin/python
+"""
+Network pixel receiver: DDP and E1.31 (sACN) over UDP.
+
+Lets a workstation render and stream pixels while the Pi only encodes
+and transmits them. Packets are received with recv_into into one
+preallocated buffer and copied straight into the strip frame, so
+nothing is allocated per packet. Completed frames go to a
+ThreadedStrip with latest-frame-wins semantics, so a slow SPI transfer
+never backs up the socket.
+
+DDP (port 4048): the data offset is a byte offset into the frame and
+the PUSH flag marks the last packet of a frame.
+
+E1.31 (port 5568): universe u carries channelsPerUniverse channels
+starting at (u - firstUniverse)*channelsPerUniverse. A frame is shown
+on a sync packet when the sender uses a sync address, otherwise when
+every universe of the strip has arrived (or one arrives twice).
+
+  python netrecv.py -n 300 -p e131 -u 1
+"""
+import socket, struct, sys, getopt
+import numpy
+import ws2812
+
+DDP_PORT = 4048
+E131_PORT = 5568
+
+DDP_VER1 = 0x40
+DDP_TIMECODE = 0x10
+DDP_PUSH = 0x01
+DDP_ID_DISPLAY = 1
+
+E131_ID = b"\x00\x10\x00\x00ASC-E1.17\x00\x00\x00"
+E131_ROOT_DATA = 0x00000004
+E131_ROOT_EXTENDED = 0x00000008
+E131_EXTENDED_SYNC = 0x00000001
+E131_OPT_PREVIEW = 0x80
+E131_DATA = 126   #offset of the first DMX slot after the start code
+
+def ddp_packet(offset, data, push=True, sequence=1):
+  """Build one DDP RGB data packet (for senders and tests)."""
+  flags = DDP_VER1 | (DDP_PUSH if push else 0)
+  return struct.pack(">BBBBIH", flags, sequence & 0x0f, 0x0b, DDP_ID_DISPLAY,
+                     offset, len(data)) + bytes(data)
+
+def e131_packet(universe, data, sequence=0, sync=0, source=b"ws2812", priority=100):
+  """Build one E1.31 data packet with DMX start code 0."""
+  data = bytes(data)
+  n = len(data)
+  dmp = struct.pack(">HBBHHH", 0x7000 | (10+n+1), 0x02, 0xa1, 0, 1, n+1) + b"\x00" + data
+  framing = struct.pack(">HI64sBHBBH", 0x7000 | (77+len(dmp)), 0x00000002,
+                        source, priority, sync, sequence & 0xff, 0, universe) + dmp
+  return E131_ID + struct.pack(">HI16s", 0x7000 | (22+len(framing)), E131_ROOT_DATA,
+                               b"\x00"*16) + framing
+
+def e131_sync_packet(sync, sequence=0):
+  framing = struct.pack(">HIBHH", 0x7000 | 11, E131_EXTENDED_SYNC, sequence & 0xff, sync, 0)
+  return E131_ID + struct.pack(">HI16s", 0x7000 | (22+len(framing)), E131_ROOT_EXTENDED,
+                               b"\x00"*16) + framing
+
+class Receiver(object):
+  def __init__(self, strip, protocol="ddp", host="0.0.0.0", port=None,
+               firstUniverse=1, channelsPerUniverse=510):
+    self.strip = strip
+    self.protocol = protocol
+    self._flat = strip.frame.reshape(-1)
+    self.firstUniverse = firstUniverse
+    self.channelsPerUniverse = channelsPerUniverse
+    self.nUniverse = -(-len(self._flat)//channelsPerUniverse)
+    self._seen = set()
+    self.frames = 0
+    self.packets = 0
+    self.bad = 0
+
+    self._buf = bytearray(1500)
+    self._view = memoryview(self._buf)
+    self._packet = numpy.frombuffer(self._buf, dtype=numpy.uint8)
+    if port is None:
+      port = DDP_PORT if protocol == "ddp" else E131_PORT
+    self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self.sock.bind((host, port))
+    self.address = self.sock.getsockname()
+    if protocol == "e131":
+      self._join_multicast()
+    elif protocol != "ddp":
+      raise ValueError("protocol must be 'ddp' or 'e131', got %r" % (protocol,))
+
+  def _join_multicast(self):
+    for universe in range(self.firstUniverse, self.firstUniverse+self.nUniverse):
+      group = socket.inet_aton("239.255.%d.%d" % (universe >> 8, universe & 0xff))
+      try:
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                             group + socket.inet_aton("0.0.0.0"))
+      except OSError:
+        #no multicast route (e.g. loopback only): unicast still works
+        break
+
+  def _copy(self, offset, start, n):
+    #copy n payload bytes at packet offset `start` to frame byte `offset`
+    n = min(n, len(self._flat)-offset)
+    if n > 0:
+      self._flat[offset:offset+n] = self._packet[start:start+n]
+
+  def _show(self):
+    self.strip.show()
+    self.frames += 1
+    self._seen.clear()
+
+  def _ddp(self, size):
+    if size < 10:
+      self.bad += 1
+      return False
+    flags, _, _, dest, offset, length = struct.unpack_from(">BBBBIH", self._buf)
+    if flags & 0xc0 != DDP_VER1 or flags & 0x06:
+      #other versions, replies and queries are ignored
+      return False
+    header = 14 if flags & DDP_TIMECODE else 10
+    if dest == DDP_ID_DISPLAY:
+      self._copy(offset, header, min(length, size-header))
+    if flags & DDP_PUSH:
+      self._show()
+      return True
+    return False
+
+  def _e131(self, size):
+    if size < 22 or self._buf[:16] != E131_ID:
+      self.bad += 1
+      return False
+    vector, = struct.unpack_from(">I", self._buf, 18)
+    if vector == E131_ROOT_EXTENDED:
+      if struct.unpack_from(">I", self._buf, 40)[0] == E131_EXTENDED_SYNC and self._seen:
+        self._show()
+        return True
+      return False
+    if vector != E131_ROOT_DATA or size < E131_DATA:
+      self.bad += 1
+      return False
+    sync, _, options, universe = struct.unpack_from(">HBBH", self._buf, 109)
+    count, startCode = struct.unpack_from(">HB", self._buf, 123)
+    if options & E131_OPT_PREVIEW or startCode != 0:
+      return False
+    index = universe - self.firstUniverse
+    if not 0 <= index < self.nUniverse:
+      return False
+    shown = False
+    if not sync and index in self._seen:
+      #a repeated universe means the sender moved on to the next frame
+      self._show()
+      shown = True
+    self._copy(index*self.channelsPerUniverse, E131_DATA, min(count-1, size-E131_DATA))
+    self._seen.add(index)
+    if not sync and len(self._seen) == self.nUniverse:
+      self._show()
+      shown = True
+    return shown
+
+  def poll(self, timeout=None):
+    """Receive one packet; returns True if it completed a frame."""
+    self.sock.settimeout(timeout)
+    try:
+      size = self.sock.recv_into(self._buf)
+    except socket.timeout:
+      return False
+    self.packets += 1
+    if self.protocol == "ddp":
+      return self._ddp(size)
+    return self._e131(size)
+
+  def serve(self):
+    while True:
+      self.poll()
+
+  def close(self):
+    self.sock.close()
+
+def usage():
+  print("Usage:")
+  print("-h", "--help")
+  print("-n", "--nLED", "default=150")
+  print("-p", "--protocol", "ddp or e131, default=ddp")
+  print("-u", "--universe", "first E1.31 universe, default=1")
+  print("-s", "--SPI", "default=0")
+  print("-b", "--bits", "default=4")
+
+if __name__=="__main__":
+  import spidev
+  try:
+    opts, args = getopt.getopt(sys.argv[1:], "hn:p:u:s:b:", ["help", "nLED=", "protocol=", "universe=", "SPI=", "bits="])
+  except getopt.GetoptError as err:
+    print(str(err))
+    usage()
+    sys.exit(2)
+  nLED=150
+  protocol="ddp"
+  universe=1
+  nSPI=0
+  bits=4
+  for o, a in opts:
+    if o in ("-h", "--help"):
+      usage()
+      sys.exit()
+    elif o in ("-n", "--nLED"):
+      nLED=int(a)
+    elif o in ("-p", "--protocol"):
+      protocol=a
+    elif o in ("-u", "--universe"):
+      universe=int(a)
+    elif o in ("-s", "--SPI"):
+      nSPI=int(a)
+    elif o in ("-b", "--bits"):
+      bits=int(a)
+
+  spi = spidev.SpiDev()
+  spi.open(nSPI, 0)
+  strip = ws2812.ThreadedStrip(spi, nLED, bits, latest=True)
+  receiver = Receiver(strip, protocol, firstUniverse=universe)
+  print("Listening for %s on %s:%d" % (protocol, receiver.address[0], receiver.address[1]))
+  try:
+    receiver.serve()
+  except KeyboardInterrupt:
+    strip.clear()
+    strip.close()
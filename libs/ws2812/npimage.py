@@ -1,79 +1,137 @@
 import spidev
 import ws2812
-import time
+import frameclock
+import matrix
+import parallel
 import numpy
 from numpy import exp, sin, pi
 
-def test_gauss(spi, shape=(8,8), intensity=20):
+class Gauss(object):
+    """The test_gauss frame for the pixels at x, y (the layout or a tile of it)."""
+    def __init__(self, x, y, mid_i, mid_j, intensity=20):
+        self.index_i=x
+        self.index_j=y
+        self.mid_i=mid_i
+        self.mid_j=mid_j
+        self.intensity=intensity
+        self.distances2=numpy.zeros(x.shape)
+        self.tmp=numpy.zeros(x.shape)
+        self.d=numpy.zeros(x.shape+(3,))
+
+    def __call__(self, out, t):
+        period_i,period_j=3,3.1
+        ri,rj=2,2
+        distances2,tmp,d=self.distances2,self.tmp,self.d
+        mi=self.mid_i+sin(2*pi*t/period_i)*ri
+        mj=self.mid_j+sin(2*pi*t/period_j)*rj
+        rg=2*(sin(2*pi*t/numpy.array([6.25, 6.5, 6.75]))+1)
+        numpy.subtract(self.index_i, mi, out=distances2)
+        numpy.square(distances2, out=distances2)
+        numpy.subtract(self.index_j, mj, out=tmp)
+        numpy.square(tmp, out=tmp)
+        distances2+=tmp
+        numpy.divide(distances2[..., None], -rg**2, out=d)
+        numpy.exp(d, out=d)
+        d*=self.intensity
+        numpy.copyto(out, d, casting="unsafe")
+
+class GaussTiles(object):
+    """Picklable tile factory for parallel.ParallelRenderer."""
+    def __init__(self, layout, intensity=20):
+        self.layout=layout
+        self.intensity=intensity
+
+    def __call__(self, rows):
+        layout=self.layout
+        return Gauss(layout.x[rows], layout.y[rows], layout.width/2., layout.height/2.,
+                     self.intensity)
+
+def test_gauss(spi, shape=(8,8), intensity=20, layout=None, workers=None):
     
     stepTime=0.05
-    nLED=shape[0]*shape[1]
-    index_i=numpy.array(range(nLED))%shape[0]
-    index_j=numpy.array(range(nLED))/shape[0]
-    mid_i=shape[0]/2.
-    mid_j=shape[1]/2.
-    period_i,period_j=3,3.1
-    ri,rj=2,2
-    tStart=time.time()
+    if layout is None:
+        layout=matrix.Matrix(shape[0], shape[1])
+    strip=ws2812.Strip(spi, layout.nLED)
+    strip.set_layout(layout)
+    renderer=None
+    if workers:
+        #big panels: render tiles on several cores into shared memory
+        renderer=parallel.ParallelRenderer(layout.shape, GaussTiles(layout, intensity), workers)
+        renderer.attach(strip)
+    else:
+        #geometry only depends on the layout: computed once
+        gauss=Gauss(layout.x, layout.y, layout.width/2., layout.height/2., intensity)
     try:
-        while True:
-            t=time.time()-tStart
-            mi=mid_i+sin(2*pi*t/period_i)*ri
-            mj=mid_j+sin(2*pi*t/period_j)*rj
-            rg0=2*(sin(2*pi*t/6.25)+1)
-            rg1=2*(sin(2*pi*t/6.5)+1)
-            rg2=2*(sin(2*pi*t/6.75)+1)
-            distances2=((index_i-mi)**2+(index_j-mj)**2)
-            d=numpy.zeros((nLED,3))
-            d[:,0]=exp(-distances2/rg0**2)
-            d[:,1]=exp(-distances2/rg1**2)
-            d[:,2]=exp(-distances2/rg2**2)
-            di=numpy.array(d*intensity, dtype=numpy.uint32)
+        for t in frameclock.FrameClock(1/stepTime):
+            if renderer is None:
+                gauss(strip.frame, t)
+            else:
+                renderer.render(t)
             
-            ws2812.write2812(spi, di)
-            time.sleep(stepTime)
+            strip.show()
             
     except KeyboardInterrupt:
-        ws2812.write2812(spi, [[0, 0, 0]] * (shape[0] * shape[1]))
+        strip.clear()
+    finally:
+        if renderer is not None:
+            renderer.close()
 
-def test_heart(spi, shape=(8,8), intensity=20):
+def test_heart(spi, shape=(8,8), intensity=20, layout=None):
     
     stepTime=0.05
-    nLED=shape[0]*shape[1]
-    index_i=numpy.array(range(nLED))%shape[0]
-    index_j=numpy.array(range(nLED))/shape[0]
-    mid_i=shape[0]/2.
-    mid_j=shape[1]/2.
+    if layout is None:
+        layout=matrix.Matrix(shape[0], shape[1])
+    strip=ws2812.Strip(spi, layout.nLED)
+    strip.set_layout(layout)
+    index_i=layout.x
+    index_j=layout.y
+    mid_i=layout.width/2.
+    mid_j=layout.height/2.
     period_i,period_j=3,3.1
     ri,rj=1.5, 1.5 #2,2
-    tStart=time.time()
+    #the heart moves, so its angles are per frame; buffers are not
+    di=numpy.zeros(layout.shape)
+    dj=numpy.zeros(layout.shape)
+    distances2=numpy.zeros(layout.shape)
+    angles=numpy.zeros(layout.shape)
+    heart=numpy.zeros(layout.shape)
+    d=numpy.zeros(layout.shape+(3,))
     try:
-        while True:
-            t=time.time()-tStart
+        for t in frameclock.FrameClock(1/stepTime):
             mi=mid_i+sin(2*pi*t/period_i)*ri - 2 
             mj=mid_j+sin(2*pi*t/period_j)*rj
-            rg0=2*(sin(2*pi*t/6.25)+1)
-            rg1=2*(sin(2*pi*t/6.5)+1)
-            rg2=2*(sin(2*pi*t/6.75)+1)
-            distances2=((index_i-mi)**2+(index_j-mj)**2)
-            angles=numpy.abs(numpy.arctan2(index_j-mj, index_i-mi))
-            heart=(angles**.5+5/(0.01+abs(angles-numpy.pi))**2)/(1*numpy.pi**.5)
+            rg=2*(sin(2*pi*t/numpy.array([6.25, 6.5, 6.75]))+1)
+            numpy.subtract(index_i, mi, out=di)
+            numpy.subtract(index_j, mj, out=dj)
+            numpy.square(di, out=distances2)
+            distances2+=dj**2
+            numpy.arctan2(dj, di, out=angles)
+            numpy.abs(angles, out=angles)
+            #heart=(angles**.5+5/(0.01+abs(angles-pi))**2)/pi**.5
+            numpy.subtract(angles, numpy.pi, out=heart)
+            numpy.abs(heart, out=heart)
+            heart+=0.01
+            numpy.square(heart, out=heart)
+            numpy.divide(5, heart, out=heart)
+            numpy.sqrt(angles, out=angles)
+            heart+=angles
+            heart*=1/numpy.pi**.5
             distances2*=heart
-            d=numpy.zeros((nLED,3))
-            d[:,0]=exp(-(distances2/rg0**2)**2)
-            d[:,1]=exp(-(distances2/rg1**2)**2)
-            d[:,2]=exp(-(distances2/rg2**2)**2)
+            numpy.divide(distances2[..., None], rg**2, out=d)
+            numpy.square(d, out=d)
+            numpy.negative(d, out=d)
+            numpy.exp(d, out=d)
             #rg0=1.5
             #d[:,0]=distances2<rg0*2
             #d[:,1]=distances2<rg0*2
             #d[:,2]=distances2<rg0*2
-            di=numpy.array(d*intensity, dtype=numpy.uint32)
+            d*=intensity
+            numpy.copyto(strip.frame, d, casting="unsafe")
             
-            ws2812.write2812(spi, di)
-            time.sleep(stepTime)
+            strip.show()
             
     except KeyboardInterrupt:
-        ws2812.write2812(spi, [[0, 0, 0]] * (shape[0] * shape[1]))
+        strip.clear()
 
 if __name__=="__main__":
     spi = spidev.SpiDev()
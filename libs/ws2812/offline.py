@@ -0,0 +1,131 @@
+#!/usr/bin/python
+"""
+Offline vumood: render a WAV file into a recording, faster than realtime.
+
+vumood.py analyzes one live window at a time. For a pre-produced show
+the whole file is known in advance, so here it is memory-mapped, framed
+with a strided view (no copies), analyzed with one batched rfft per
+block of windows, and the bass detection, smoothing and colour mapping
+of vumood.py are applied to all frames at once. The result is a
+record.py file with one frame per hop, timestamped at the centre of its
+window, to be played back in sync with a track started together with
+the player (-a keeps the frames on those absolute times):
+
+  python offline.py -n 90 song.wav song.rec
+  python record.py -a song.rec
+"""
+import sys, time, getopt
+import numpy
+import audioinput, spectrum, record
+
+#same settings as vumood.py
+CHUNK = 2 ** 11
+HOP = 2 ** 9
+BASS_RANGE = (20, 200)
+SMOOTHING_FACTOR = 1 - (1 - 0.3) ** (HOP / float(CHUNK))
+BASS_THRESHOLD = 100
+MIN_DB_DIFFERENCE = 1
+#vumood's strip: GRB at MAX_BRIGHTNESS/255, stored in the recording for the player
+ORDER = "GRB"
+BRIGHTNESS = 255/255.
+
+def smooth_runs(x, active, factor, block=64):
+  """
+  Vectorized form of vumood's smoothing loop,
+    s = factor*x + (1-factor)*s if active else 0
+  Each block of frames is solved in closed form with a cumulative sum;
+  only the carry from one block to the next is a Python loop.
+  """
+  n = len(x)
+  s = numpy.zeros(n)
+  a = 1.0-factor
+  if a <= 0:
+    s[active] = x[active]
+    return s
+  #a**-block must stay well inside float range and precision
+  block = max(1, min(block, int(12/-numpy.log10(a)) if a < 1 else block))
+  nBlocks = -(-n//block)
+  xs = numpy.zeros((nBlocks, block))
+  act = numpy.zeros((nBlocks, block), dtype=bool)
+  xs.reshape(-1)[:n] = numpy.where(active, x, 0)
+  act.reshape(-1)[:n] = active
+  k = numpy.arange(block)
+  c = numpy.cumsum(factor*xs*a**-k, axis=1)
+  #the last reset (inactive frame) at or before each frame of its block
+  last = numpy.maximum.accumulate(numpy.where(act, -1, k), axis=1)
+  base = numpy.where(last >= 0, numpy.take_along_axis(c, numpy.maximum(last, 0), axis=1), 0)
+  out = (c-base)*a**k
+  out[~act] = 0
+  #frames with no reset before them in their block continue the last block
+  decay = numpy.where(last < 0, a**(k+1), 0)
+  carry = 0.0
+  for row, d in zip(out, decay):
+    if carry:
+      row += carry*d
+    carry = row[-1]
+  s[:] = out.reshape(-1)[:n]
+  return s
+
+def hls_colors(hue, out=None):
+  """colorsys.hls_to_rgb(hue, 0.5, 1.0) for an array of hues, as int(255*c)."""
+  if out is None:
+    out = numpy.zeros((len(hue), 3), dtype=numpy.uint8)
+  for channel, shift in enumerate((1.0/3.0, 0.0, -1.0/3.0)):
+    h = numpy.mod(hue+shift, 1.0)
+    v = numpy.minimum(h*6.0, (2.0/3.0-h)*6.0)
+    numpy.clip(v, 0.0, 1.0, out=v)
+    v *= 255
+    out[:, channel] = v
+  return out
+
+def bass_colors(bass, mid, threshold=BASS_THRESHOLD, minDiff=MIN_DB_DIFFERENCE,
+                smoothing=SMOOTHING_FACTOR):
+  """vumood's per-window colour for arrays of bass and mid dB."""
+  active = (bass > threshold) & ((bass-mid) > minDiff)
+  strength = numpy.minimum((bass-threshold)/20, 1.0)
+  smoothed = smooth_runs(strength, active, smoothing)
+  colors = hls_colors(0.66 - 0.66*smoothed)
+  colors[~active] = 0
+  return colors
+
+def render(wav, path, nLED, window=CHUNK, hop=HOP):
+  """Analyze wav and write an nLED recording to path; returns the frame count."""
+  rate, data = audioinput.load_wav(wav)
+  frames = audioinput.frame_view(data[:, 0], window, hop)
+  analyzer = spectrum.SpectrumAnalyzer(window, rate, edges=(BASS_RANGE[0], BASS_RANGE[1], 1000))
+  db = analyzer.band_db(frames)
+  colors = bass_colors(db[:, 0], db[:, 1])
+  t = (numpy.arange(len(frames))*hop + window/2.0)/rate
+  rec = record.Recorder(path, nLED=nLED, order=ORDER, brightness=BRIGHTNESS)
+  frame = numpy.zeros((nLED, 3), dtype=numpy.uint8)
+  for ti, color in zip(t, colors):
+    frame[:] = color
+    rec.append(frame, t=ti)
+  rec.close()
+  return len(frames)
+
+def usage():
+  print("Usage: offline.py [options] input.wav output.rec")
+  print("-h", "--help")
+  print("-n", "--nLED", "default=90")
+
+if __name__=="__main__":
+  try:
+    opts, args = getopt.getopt(sys.argv[1:], "hn:", ["help", "nLED="])
+  except getopt.GetoptError as err:
+    print(str(err))
+    usage()
+    sys.exit(2)
+  nLED=90
+  for o, a in opts:
+    if o in ("-h", "--help"):
+      usage()
+      sys.exit()
+    elif o in ("-n", "--nLED"):
+      nLED=int(a)
+  if len(args) != 2:
+    usage()
+    sys.exit(2)
+  tStart = time.time()
+  n = render(args[0], args[1], nLED)
+  print("%d frames in %.2f s" % (n, time.time()-tStart))
@@ -0,0 +1,135 @@
+"""
+Render one frame on several cores.
+
+The logical frame lives in a multiprocessing.shared_memory block. It
+is split into tiles of whole rows, one per worker process; every worker
+renders its tile straight into the shared buffer, and a barrier starts
+and ends each frame. The strip encodes from the same buffer, so no
+pixel is pickled or copied between processes.
+
+factory is called once in each worker with the slice of rows it owns
+and returns the tile renderer, so per-tile geometry is precomputed
+there; it must be picklable (a module level function or class):
+
+  class Gauss(object):
+    def __init__(self, layout):
+      self.layout = layout
+    def __call__(self, rows):
+      x, y = self.layout.x[rows], self.layout.y[rows]
+      def render(tile, t):            #tile is frame[rows]
+        ...
+      return render
+
+  renderer = parallel.ParallelRenderer(layout.shape, Gauss(layout))
+  strip.set_layout(layout)
+  renderer.attach(strip)
+  for t in frameclock.FrameClock(50):
+    renderer.render(t)
+    strip.show()
+  renderer.close()
+"""
+import multiprocessing, os, threading
+from multiprocessing import shared_memory
+import numpy
+
+#control block in front of the frame: [t, stop]
+CONTROL = 16
+
+def _attach(name):
+  try:
+    return shared_memory.SharedMemory(name=name, track=False)
+  except TypeError:
+    #before Python 3.13; workers share the renderer's resource tracker
+    return shared_memory.SharedMemory(name=name)
+
+def _views(shm, shape):
+  control = numpy.ndarray(2, dtype=numpy.float64, buffer=shm.buf)
+  frame = numpy.ndarray(shape, dtype=numpy.uint8, buffer=shm.buf, offset=CONTROL)
+  return control, frame
+
+def _worker(name, shape, rows, factory, barrier):
+  shm = _attach(name)
+  control, frame = _views(shm, shape)
+  tile = frame[rows]
+  try:
+    render = factory(rows)
+    while True:
+      barrier.wait()
+      if control[1]:
+        break
+      render(tile, control[0])
+      barrier.wait()
+  except threading.BrokenBarrierError:
+    pass
+  except BaseException:
+    #wake the renderer instead of leaving it waiting for this tile
+    barrier.abort()
+    raise
+  finally:
+    del control, frame, tile
+    shm.close()
+
+class ParallelRenderer(object):
+  """
+  shape:   logical frame shape without the colour axis, e.g. (nLED,)
+           or a Matrix's (height, width)
+  factory: factory(rows) -> render(tile, t), see above
+  workers: processes (tiles), default one per core
+  """
+  def __init__(self, shape, factory, workers=None):
+    shape = tuple(shape) + (3,)
+    if workers is None:
+      workers = os.cpu_count() or 1
+    workers = max(1, min(workers, shape[0]))
+    self.shape = shape
+    self._shm = shared_memory.SharedMemory(create=True, size=CONTROL + int(numpy.prod(shape)))
+    self._control, self.frame = _views(self._shm, shape)
+    self._control[:] = 0
+    self.frame.fill(0)
+    self._strips = []
+    bounds = numpy.linspace(0, shape[0], workers+1).astype(int)
+    self.tiles = [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+    self._barrier = multiprocessing.Barrier(workers+1)
+    self._workers = [multiprocessing.Process(target=_worker, name="ws2812-tile%d" % i,
+                                             args=(self._shm.name, shape, rows, factory,
+                                                   self._barrier))
+                     for i, rows in enumerate(self.tiles)]
+    for p in self._workers:
+      p.daemon = True
+      p.start()
+
+  def attach(self, strip):
+    """Make strip encode straight from the shared frame."""
+    if strip.frame.shape != self.shape:
+      raise ValueError("strip frame is %s, renderer frame is %s"
+                       % (strip.frame.shape, self.shape))
+    strip.frame = self.frame
+    self._strips.append(strip)
+
+  def render(self, t):
+    """Render the frame at time t on all workers; returns the shared frame."""
+    self._control[0] = t
+    self._barrier.wait()
+    self._barrier.wait()
+    return self.frame
+
+  def close(self):
+    if self._workers:
+      self._control[1] = 1
+      try:
+        self._barrier.wait(timeout=1.0)
+      except threading.BrokenBarrierError:
+        pass
+      for p in self._workers:
+        p.join(1.0)
+        if p.is_alive():
+          p.terminate()
+      self._workers = []
+      #attached strips get their own copy so the block can be released
+      for strip in self._strips:
+        if strip.frame is self.frame:
+          strip.frame = self.frame.copy()
+      self._strips = []
+      del self._control, self.frame
+      self._shm.close()
+      self._shm.unlink()
@@ -0,0 +1,327 @@
+#!/usr/bin/python
+"""
+Record what a strip shows, and play it back.
+
+A Recorder hooks a Strip's encoder, so every frame that goes out is
+appended with its monotonic timestamp: the RGB frame and, with spi=True,
+the encoded SPI bytes. Frames are buffered in a preallocated chunk and
+written a chunk at a time; close() appends an index of the chunks.
+
+  rec = record.Recorder("show.rec", strip, spi=True)
+  ...                       #run the show as usual
+  rec.close()
+
+A Recording memory-maps the file (a file without an index, e.g. from a
+crash, is recovered by scanning the chunks) and play() streams it to a
+strip at the original speed, scaled, or as fast as possible, either
+re-encoding the RGB frames or sending the recorded SPI bytes. The RGB
+frames are the frames before the output stage, one pixel per LED in
+wire order (a strip with a layout is recorded unmapped); the channel
+order, brightness, gamma table and current limit they were shown with
+are kept in the header, and the player sets them up on its strip.
+Played to a fakespi device as fast as possible it is a load generator:
+
+  python record.py -f -x 0 show.rec
+
+File layout, little endian:
+  header  "WSRC", version, nLED, bits, spiBytes, channel order (3 bytes,
+          empty if unknown), pad byte, brightness (float64, 0 if
+          unknown), max_mA (float64, 0 if none), gamma table (256
+          bytes), padded to 512 bytes
+  chunk   "CHNK", count, then count records of
+            t (float64 seconds since the start), rgb (nLED*3), spi (spiBytes)
+  index   "INDX", count, then (offset, first frame, first t) per chunk
+  trailer index offset (uint64), "WEND"
+"""
+import mmap, struct, sys, time, getopt
+import numpy
+import ws2812, frameclock
+
+MAGIC = b"WSRC"
+VERSION = 3
+HEADER = struct.Struct("<4sIIII3sxdd256s")
+HEADER_SIZE = 512
+CHUNK = struct.Struct("<4sI")
+CHUNK_MAGIC = b"CHNK"
+INDEX = struct.Struct("<4sI")
+INDEX_MAGIC = b"INDX"
+INDEX_ENTRY = numpy.dtype([("offset", "<u8"), ("first", "<u8"), ("t", "<f8")])
+TRAILER = struct.Struct("<Q4s")
+TRAILER_MAGIC = b"WEND"
+
+def record_dtype(nLED, spiBytes=0):
+  fields = [("t", "<f8"), ("rgb", "u1", (nLED, 3))]
+  if spiBytes:
+    fields.append(("spi", "u1", (spiBytes,)))
+  return numpy.dtype(fields)
+
+class Recorder(object):
+  """
+  Append frames to `path`. With a strip, every frame it encodes is
+  recorded until close(); without one, call append() yourself and give
+  the output settings (as for Strip.set_output) the frames are meant for.
+  """
+  def __init__(self, path, strip=None, nLED=None, bits=None, spi=False, chunkFrames=64,
+               now=frameclock.monotonic, order=None, brightness=None, gamma=None, max_mA=None):
+    if strip is not None:
+      nLED, bits = strip.nLED, strip.bits
+      order, brightness, gamma, max_mA = strip.order, strip.brightness, strip.gamma, strip.max_mA
+    if nLED is None:
+      raise ValueError("need a strip or nLED")
+    self.nLED = nLED
+    self.bits = bits or 0
+    self.spiBytes = nLED*3*self.bits+1 if spi else 0
+    self.order = order
+    self.brightness = brightness
+    self.max_mA = max_mA
+    if gamma is True:
+      gamma = ws2812.GAMMA
+    elif gamma is None:
+      gamma = range(256)
+    self.gamma = bytes(bytearray(max(min(int(round(g)), 255), 0) for g in gamma))
+    if len(self.gamma) != 256:
+      raise ValueError("gamma table needs 256 entries, got %d" % len(self.gamma))
+    if spi and not bits:
+      raise ValueError("recording SPI bytes needs bits")
+    self.dtype = record_dtype(nLED, self.spiBytes)
+    self._chunk = numpy.zeros(chunkFrames, dtype=self.dtype)
+    self._n = 0
+    self._index = []
+    self.frames = 0
+    self._now = now
+    self._start = now()
+    self._file = open(path, "wb")
+    self._file.write(HEADER.pack(MAGIC, VERSION, nLED, self.bits, self.spiBytes,
+                                 (order or "").upper().encode("ascii"), brightness or 0.0,
+                                 max_mA or 0.0, self.gamma)
+                     .ljust(HEADER_SIZE, b"\0"))
+    self.strip = None
+    if strip is not None:
+      self.attach(strip)
+
+  def attach(self, strip):
+    """Record every frame strip encodes (show() and clear())."""
+    if (strip.nLED, strip.bits if self.bits else 0) != (self.nLED, self.bits):
+      raise ValueError("strip does not match the recording")
+    encode = strip.encode
+    mapped = [None, None]   #layout, its index as intp
+    def recording_encode():
+      tx = encode()
+      pixels = None
+      if strip.layout is not None:
+        if mapped[0] is not strip.layout:
+          mapped[:] = strip.layout, numpy.asarray(strip.layout.index, dtype=numpy.intp)
+        pixels = mapped[1]
+      self.append(strip.frame, tx, pixels=pixels)
+      return tx
+    strip.encode = recording_encode
+    self.strip = strip
+
+  def detach(self):
+    if self.strip is not None:
+      del self.strip.encode
+      self.strip = None
+
+  def append(self, frame, tx=None, t=None, pixels=None):
+    """
+    Add a frame; pixels is the frame pixel of every LED on the wire
+    (a layout's index) when frame is not one pixel per LED in order.
+    """
+    rec = self._chunk[self._n]
+    rec["t"] = self._now()-self._start if t is None else t
+    if pixels is None:
+      rec["rgb"] = numpy.frombuffer(frame, dtype=numpy.uint8).reshape(self.nLED, 3)
+    else:
+      numpy.take(frame.reshape(-1, 3), pixels, axis=0, out=rec["rgb"], mode="clip")
+    if self.spiBytes:
+      rec["spi"] = numpy.frombuffer(tx, dtype=numpy.uint8)
+    self._n += 1
+    self.frames += 1
+    if self._n == len(self._chunk):
+      self.flush()
+
+  def flush(self):
+    """Write the buffered frames as one chunk."""
+    if not self._n:
+      return
+    chunk = self._chunk[:self._n]
+    self._index.append((self._file.tell(), self.frames-self._n, chunk[0]["t"]))
+    self._file.write(CHUNK.pack(CHUNK_MAGIC, self._n))
+    self._file.write(memoryview(chunk).cast("B"))
+    self._file.flush()
+    self._n = 0
+
+  def close(self):
+    self.detach()
+    self.flush()
+    offset = self._file.tell()
+    self._file.write(INDEX.pack(INDEX_MAGIC, len(self._index)))
+    self._file.write(numpy.array(self._index, dtype=INDEX_ENTRY).tobytes())
+    self._file.write(TRAILER.pack(offset, TRAILER_MAGIC))
+    self._file.close()
+
+class Recording(object):
+  """A recorded file, memory-mapped; chunks are views into the mapping."""
+  def __init__(self, path):
+    with open(path, "rb") as f:
+      self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(self._mm) < HEADER_SIZE:
+      raise ValueError("%s is not a ws2812 recording" % path)
+    (magic, version, self.nLED, self.bits, self.spiBytes,
+     order, brightness, max_mA, gamma) = HEADER.unpack_from(self._mm, 0)
+    if magic != MAGIC:
+      raise ValueError("%s is not a ws2812 recording" % path)
+    if version != VERSION:
+      raise ValueError("%s is a version %d recording, this reads version %d"
+                       % (path, version, VERSION))
+    #output settings the frames were shown with; order and brightness None if not recorded
+    self.order = order.decode("ascii") or None
+    self.brightness = brightness or None
+    self.max_mA = max_mA or None
+    self.gamma = None if gamma == bytes(bytearray(range(256))) else tuple(bytearray(gamma))
+    self.dtype = record_dtype(self.nLED, self.spiBytes)
+    self.chunks = [numpy.frombuffer(self._mm, dtype=self.dtype, count=count, offset=offset)
+                   for offset, count in self._read_index()]
+    self.frames = sum(len(c) for c in self.chunks)
+    self.duration = self.chunks[-1]["t"][-1]-self.chunks[0]["t"][0] if self.frames else 0.0
+
+  def _read_index(self):
+    size = len(self._mm)
+    if size >= HEADER_SIZE+TRAILER.size:
+      offset, magic = TRAILER.unpack_from(self._mm, size-TRAILER.size)
+      if magic == TRAILER_MAGIC:
+        _, count = INDEX.unpack_from(self._mm, offset)
+        index = numpy.frombuffer(self._mm, dtype=INDEX_ENTRY, count=count,
+                                 offset=offset+INDEX.size)
+        return [(int(o)+CHUNK.size, CHUNK.unpack_from(self._mm, int(o))[1])
+                for o in index["offset"]]
+    #no index: walk the chunks, dropping a truncated last one
+    chunks = []
+    offset = HEADER_SIZE
+    while offset+CHUNK.size <= size:
+      magic, count = CHUNK.unpack_from(self._mm, offset)
+      end = offset+CHUNK.size+count*self.dtype.itemsize
+      if magic != CHUNK_MAGIC or end > size:
+        break
+      chunks.append((offset+CHUNK.size, count))
+      offset = end
+    return chunks
+
+  def __iter__(self):
+    for chunk in self.chunks:
+      for rec in chunk:
+        yield rec
+
+  def close(self):
+    self.chunks = []
+    self._mm.close()
+
+def play(strip, recording, speed=1.0, raw=None, sleep=time.sleep, now=frameclock.monotonic,
+         absolute=False):
+  """
+  Stream a recording to strip. speed scales the recorded timing, 0 plays
+  as fast as possible. raw sends the recorded SPI bytes instead of
+  re-encoding the RGB frames (default: when they were recorded for this
+  strip's length and encoding). The first frame goes out at once, unless
+  absolute: then the call is t=0 and every frame waits for its own t,
+  for recordings timed against a track started with the call. Returns
+  (frames, seconds).
+  """
+  if (strip.nLED, strip.arrays) != (recording.nLED, True):
+    raise ValueError("recording is for %d LEDs, needs a numpy backed Strip of that length"
+                     % recording.nLED)
+  canRaw = recording.spiBytes == len(strip._tx) and recording.bits == strip.bits
+  if raw is None:
+    raw = canRaw
+  elif raw and not canRaw:
+    raise ValueError("recording has no SPI bytes for this strip")
+  frames = 0
+  start = latched = now()
+  t0 = 0.0 if absolute else None
+  for rec in recording:
+    wait = latched-now()
+    if speed:
+      if t0 is None:
+        t0 = rec["t"]
+      wait = max(wait, start+(rec["t"]-t0)/speed-now())
+    if wait > 0:
+      sleep(wait)
+    if raw:
+      strip._write(rec["spi"])
+    else:
+      strip.frame[...] = rec["rgb"]
+      strip.show()
+    #back to back frames must be apart by the latch time or they merge
+    latched = now()+ws2812.LATCH
+    frames += 1
+  return frames, now()-start
+
+def usage():
+  print("Usage: record.py [options] file")
+  print("-h", "--help")
+  print("-x", "--speed", "playback speed, 0 = as fast as possible, default=1")
+  print("-a", "--absolute", "frame times count from the start of playback (offline.py files)")
+  print("-e", "--encode", "re-encode the RGB frames instead of sending recorded SPI bytes")
+  print("-f", "--fake", "play to the fakespi emulator and report throughput")
+  print("-s", "--SPI", "default=0")
+  print("-o", "--order", "channel order of the strip, default: as recorded, else RGB")
+  print("-b", "--brightness", "0.0-1.0, default: as recorded, else 1.0")
+
+if __name__=="__main__":
+  try:
+    opts, args = getopt.getopt(sys.argv[1:], "hx:aefs:o:b:", ["help", "speed=", "absolute", "encode",
+                                                        "fake", "SPI=", "order=", "brightness="])
+  except getopt.GetoptError as err:
+    print(str(err))
+    usage()
+    sys.exit(2)
+  speed=1.0
+  raw=None
+  absolute=False
+  fake=False
+  nSPI=0
+  order=None
+  brightness=None
+  for o, a in opts:
+    if o in ("-h", "--help"):
+      usage()
+      sys.exit()
+    elif o in ("-x", "--speed"):
+      speed=float(a)
+    elif o in ("-a", "--absolute"):
+      absolute=True
+    elif o in ("-e", "--encode"):
+      raw=False
+    elif o in ("-f", "--fake"):
+      fake=True
+    elif o in ("-s", "--SPI"):
+      nSPI=int(a)
+    elif o in ("-o", "--order"):
+      order=a
+    elif o in ("-b", "--brightness"):
+      brightness=float(a)
+  if len(args) != 1:
+    usage()
+    sys.exit(2)
+
+  recording = Recording(args[0])
+  if fake:
+    import fakespi
+    spi = fakespi.SpiDev(0, 0, realtime=True, decoding=False)
+  else:
+    import spidev
+    spi = spidev.SpiDev()
+    spi.open(nSPI, 0)
+  strip = ws2812.Strip(spi, recording.nLED, recording.bits or 4,
+                       order=order or recording.order or "RGB",
+                       brightness=brightness if brightness is not None else recording.brightness or 1.0,
+                       gamma=recording.gamma, max_mA=recording.max_mA)
+  print("%d frames, %.1f s, %d LEDs" % (recording.frames, recording.duration, recording.nLED))
+  try:
+    frames, seconds = play(strip, recording, speed, raw, absolute=absolute)
+    print("%d frames in %.2f s: %.1f fps, %.1f kLED/s" % (
+        frames, seconds, frames/seconds, frames*recording.nLED/seconds/1000))
+  except KeyboardInterrupt:
+    pass
+  finally:
+    strip.clear()
@@ -23,5 +23,9 @@ setup(name		= "ws2812",
       license		= "GPLv2",
       classifiers	= classifiers,
       url		= "http://github.com/joosteto/raspberry_ws2812",
-      py_modules      = ['ws2812'],
+      py_modules      = ['ws2812', 'effects', 'frameclock', 'audioinput', 'spectrum',
+                         'multistrip', 'fakespi', 'netrecv', 'fbdaemon',
+                         'compositor', 'bake', 'record', 'offline', 'stats',
+                         'matrix', 'fxdaemon', 'fx_rainbow', 'fx_mood', 'fx_vumood',
+                         'fx_vumeter', 'fx_spectrum', 'parallel', 'fixedpoint'],
       )
@@ -0,0 +1,109 @@
+"""
+Multi-band spectrum analyzer.
+
+Everything that only depends on (size, rate) - the Hann window, the bin
+frequencies and the bin index range of every band - is computed once,
+so each frame is one window multiply, one rfft and one reduceat over
+the power spectrum:
+
+  analyzer = SpectrumAnalyzer(2048, 44100, nBands=30)
+  for samples in audio.windows():
+    analyzer.process(samples)
+    effects.spectrum(strip.frame, analyzer.level)
+"""
+import numpy
+
+class SpectrumAnalyzer(object):
+  """
+  size, rate:   samples per analysis window and sample rate
+  nBands:       number of log-spaced bands between fmin and fmax
+  edges:        explicit band edges in Hz instead, e.g. (20, 200, 1000)
+                gives a bass and a mid band; band i is [edges[i], edges[i+1])
+  smoothing:    exponential smoothing factor for the band energies
+  fall, rise:   dB per frame the adaptive ceiling falls / floor rises
+  minRange:     smallest dB span between floor and ceiling
+  """
+  def __init__(self, size, rate, nBands=16, fmin=20., fmax=16000., edges=None,
+               smoothing=0.3, fall=0.05, rise=0.02, minRange=12.):
+    self.size = size
+    self.rate = rate
+    self.window = numpy.hanning(size)
+    self.freqs = numpy.fft.rfftfreq(size, 1.0/rate)
+    if edges is None:
+      edges = numpy.geomspace(fmin, fmax, nBands+1)
+    idx = numpy.searchsorted(self.freqs, edges)
+    #every band needs at least one bin, otherwise reduceat repeats a bin
+    for i in range(1, len(idx)):
+      idx[i] = max(idx[i], idx[i-1]+1)
+    if idx[-1] > len(self.freqs):
+      raise ValueError("%d bands do not fit in a %d sample window" % (len(idx)-1, size))
+    self.edges = self.freqs[numpy.minimum(idx, len(self.freqs)-1)]
+    self.nBands = len(idx)-1
+    self._starts = idx[:-1]
+    self._stop = idx[-1]
+    self.smoothing = smoothing
+    self.fall = fall
+    self.rise = rise
+    self.minRange = minRange
+
+    self._windowed = numpy.zeros(size)
+    self._power = numpy.zeros(len(self.freqs))
+    self.db = numpy.zeros(self.nBands)        #band energies of the last frame
+    self.smoothed = numpy.zeros(self.nBands)  #exponentially smoothed db
+    self.floor = numpy.zeros(self.nBands)     #adaptive lower threshold
+    self.ceil = numpy.zeros(self.nBands)      #adaptive upper threshold
+    self.level = numpy.zeros(self.nBands)     #smoothed scaled to 0..1
+    self._span = numpy.zeros(self.nBands)
+    self._first = True
+
+  def band_db(self, frames, out=None, block=1024):
+    """
+    Band energies in dB of many windows at once: frames is (n, size),
+    e.g. audioinput.frame_view() of a whole file. Each block of frames
+    is one batched rfft; smoothing and thresholds are not touched.
+    """
+    n = len(frames)
+    if out is None:
+      out = numpy.zeros((n, self.nBands))
+    windowed = numpy.zeros((min(block, n), self.size))
+    for start in range(0, n, block):
+      chunk = frames[start:start+block]
+      w = windowed[:len(chunk)]
+      numpy.multiply(chunk, self.window, out=w)
+      power = numpy.abs(numpy.fft.rfft(w, axis=1))
+      numpy.square(power, out=power)
+      numpy.add.reduceat(power[:, :self._stop], self._starts, axis=1, out=out[start:start+len(chunk)])
+    out += 1e-10
+    numpy.log10(out, out=out)
+    out *= 10
+    return out
+
+  def process(self, samples):
+    """Analyze one window of samples; returns the band energies in dB."""
+    numpy.multiply(samples, self.window, out=self._windowed)
+    numpy.abs(numpy.fft.rfft(self._windowed), out=self._power)
+    numpy.square(self._power, out=self._power)
+    numpy.add.reduceat(self._power[:self._stop], self._starts, out=self.db)
+    self.db += 1e-10
+    numpy.log10(self.db, out=self.db)
+    self.db *= 10
+
+    if self._first:
+      self.smoothed[:] = self.db
+      self.floor[:] = self.db
+      self.ceil[:] = self.db
+      self._first = False
+    else:
+      self.smoothed *= 1-self.smoothing
+      self.smoothed += self.smoothing*self.db
+      self.ceil -= self.fall
+      numpy.maximum(self.ceil, self.smoothed, out=self.ceil)
+      self.floor += self.rise
+      numpy.minimum(self.floor, self.smoothed, out=self.floor)
+
+    numpy.subtract(self.ceil, self.floor, out=self._span)
+    numpy.maximum(self._span, self.minRange, out=self._span)
+    numpy.subtract(self.smoothed, self.floor, out=self.level)
+    self.level /= self._span
+    numpy.clip(self.level, 0, 1, out=self.level)
+    return self.db
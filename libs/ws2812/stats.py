@@ -0,0 +1,191 @@
+"""
+Per-stage frame timing.
+
+Durations of the stages of a frame - waiting for audio, analysis,
+render, encode and the SPI transfer - go into fixed-size log-scale
+histograms (4 bins per octave from 1us to ~1s), so recording a sample
+is a frexp and an increment and memory never grows. Dropped and late
+frames and audio overruns are counted alongside.
+
+Strip, ThreadedStrip, AudioInput and FrameClock record their own stages
+when given a Stats (their `stats` attribute, None by default); the
+script times its own analysis and render with lap():
+
+  timing = stats.Stats(log=10)         #one summary line every 10 s
+  timing.install(signal.SIGUSR1)       #full dump on kill -USR1
+  timing.attach(strip, audio)
+  for data in audio.windows():
+    t = timing.now()
+    analyzer.process(data)
+    t = timing.lap("analysis", t)
+    effects.spectrum(strip.frame, analyzer.level)
+    timing.lap("render", t)
+    strip.show()
+
+Stats.from_env() is enabled only when $WS2812_STATS is set (to the log
+interval in seconds, 0 for dumps on SIGUSR1 only). A disabled Stats is
+not attached and installs no handler, so the strip and audio input
+keep stats None, and the script's own lap() calls cost one attribute
+check each.
+
+The dump requested by the signal is printed by the next frame(), from
+the frame loop rather than inside the signal handler.
+"""
+import math, os, signal, sys, threading, time
+
+STAGES = ("audio", "analysis", "render", "encode", "spi")
+BINS_PER_OCTAVE = 4
+OCTAVES = 20
+
+class Histogram(object):
+  def __init__(self):
+    self.counts = [0]*(BINS_PER_OCTAVE*OCTAVES)
+    self.n = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def add(self, seconds):
+    m, e = math.frexp(seconds*1e6)
+    i = min(max(e*BINS_PER_OCTAVE + int((m-0.5)*2*BINS_PER_OCTAVE), 0), len(self.counts)-1)
+    self.counts[i] += 1
+    self.n += 1
+    self.total += seconds
+    if seconds > self.max:
+      self.max = seconds
+
+  def percentile(self, p):
+    """Upper edge of the bin holding the p-th percentile, in seconds."""
+    if not self.n:
+      return 0.0
+    rank = p/100.*self.n
+    seen = 0
+    for i, count in enumerate(self.counts):
+      seen += count
+      if seen >= rank:
+        e, sub = divmod(i+1, BINS_PER_OCTAVE)
+        return min(math.ldexp(0.5 + sub/(2.*BINS_PER_OCTAVE), e)*1e-6, self.max)
+    return self.max
+
+  def mean(self):
+    return self.total/self.n if self.n else 0.0
+
+  def reset(self):
+    self.__init__()
+
+class Stats(object):
+  def __init__(self, enabled=True, log=None, out=None):
+    self.enabled = enabled
+    self.logInterval = log
+    self.out = out
+    self.stages = dict((name, Histogram()) for name in STAGES)
+    self.counts = {"dropped": 0, "late": 0, "overrun": 0}
+    self.frames = 0
+    #add() from the writer thread of a ThreadedStrip vs dump()
+    self._lock = threading.Lock()
+    self._start = self._lastLog = time.perf_counter()
+    self._lastFrames = 0
+    self._dump = False   #set by the signal handler, printed by frame()
+
+  @classmethod
+  def from_env(cls, name="WS2812_STATS"):
+    value = os.environ.get(name)
+    if value is None:
+      return cls(enabled=False)
+    return cls(log=float(value) or None)
+
+  def now(self):
+    return time.perf_counter() if self.enabled else 0.0
+
+  def add(self, stage, seconds):
+    if not self.enabled:
+      return
+    hist = self.stages.get(stage)
+    if hist is None:
+      hist = self.stages[stage] = Histogram()
+    #the SPI stage of a ThreadedStrip is added from its writer thread
+    with self._lock:
+      hist.add(seconds)
+
+  def lap(self, stage, start):
+    """Add the time since start to stage; returns now for the next lap."""
+    if not self.enabled:
+      return 0.0
+    now = time.perf_counter()
+    self.add(stage, now-start)
+    return now
+
+  def attach(self, *targets):
+    """Set the stats attribute of targets (Strip, AudioInput, FrameClock) if enabled."""
+    if self.enabled:
+      for target in targets:
+        target.stats = self
+    return self
+
+  def count(self, name, n=1):
+    if self.enabled:
+      self.counts[name] = self.counts.get(name, 0) + n
+
+  def frame(self):
+    """One frame was output; prints the log line or a requested dump when due."""
+    if not self.enabled:
+      return
+    self.frames += 1
+    if self._dump:
+      self._dump = False
+      self._write(self.dump())
+    if self.logInterval is not None:
+      now = time.perf_counter()
+      if now - self._lastLog >= self.logInterval:
+        self._write(self.line(now))
+
+  def line(self, now=None):
+    """Frame rate, median and worst time of every stage, and the counters."""
+    if now is None:
+      now = time.perf_counter()
+    fps = (self.frames-self._lastFrames)/max(now-self._lastLog, 1e-9)
+    self._lastLog = now
+    self._lastFrames = self.frames
+    parts = ["%.1f fps" % fps]
+    for name, hist in self.stages.items():
+      if hist.n:
+        parts.append("%s %.2f/%.2f ms" % (name, 1e3*hist.percentile(50), 1e3*hist.max))
+    parts.extend("%s %d" % item for item in sorted(self.counts.items()) if item[1])
+    return " | ".join(parts)
+
+  def dump(self):
+    """Full table: count, mean, p50, p90, p99 and max per stage."""
+    elapsed = time.perf_counter()-self._start
+    lines = ["%d frames in %.1f s (%.1f fps)" % (self.frames, elapsed, self.frames/max(elapsed, 1e-9)),
+             "%-10s %8s %8s %8s %8s %8s %8s" % ("stage", "n", "mean", "p50", "p90", "p99", "max")]
+    with self._lock:
+      for name, hist in self.stages.items():
+        if hist.n:
+          lines.append("%-10s %8d %8.3f %8.3f %8.3f %8.3f %8.3f" % (
+              name, hist.n, 1e3*hist.mean(), 1e3*hist.percentile(50), 1e3*hist.percentile(90),
+              1e3*hist.percentile(99), 1e3*hist.max))
+    lines.extend("%-10s %8d" % item for item in sorted(self.counts.items()))
+    return "\n".join(lines)
+
+  def reset(self):
+    with self._lock:
+      for hist in self.stages.values():
+        hist.reset()
+    for name in self.counts:
+      self.counts[name] = 0
+    self.frames = self._lastFrames = 0
+    self._start = self._lastLog = time.perf_counter()
+
+  def _write(self, text):
+    out = self.out or sys.stdout
+    out.write(text + "\n")
+    out.flush()
+
+  def install(self, signum=getattr(signal, "SIGUSR1", None)):
+    """Print dump() at the next frame() whenever the process receives signum."""
+    if self.enabled:
+      signal.signal(signum, self._request_dump)
+    return self
+
+  def _request_dump(self, sig, frame):
+    #only a flag: writing from the handler could interleave with a log line
+    self._dump = True
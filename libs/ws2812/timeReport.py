@@ -1,4 +1,5 @@
 import timeit
+import numpy
 import ws2812
 """
 Run timing report on functions
@@ -39,21 +40,56 @@ write2812_pylist8   (nLED=144):  17.57 ms
 """
 
 setupFmt="import ws2812,spidev;spi=spidev.SpiDev();spi.open(0,0);n=[[i%30,4*(i%3),i%7] for i in range({nLED})];ws2812.write2812(spi, [0,0,0]*150)" #.format(nLED=8)
-stmtFmt="ws2812.{function}(spi, n)" #.format(function="write2812_numpy4")
+stmtFmt="ws2812.{function}(spi, n{args})" #.format(function="write2812_numpy4", args="")
 
 
 nCall=200
-for function in ["write2812_numpy4", "write2812_numpy8",
-                 "write2812_pylist4", "write2812_pylist8"
+for function, args in [("write2812_numpy4", ""), ("write2812_numpy8", ""),
+                       ("write2812_pylist4", ""), ("write2812_pylist8", ""),
+                       ("write2812_numpylut", ", bits=3"),
+                       ("write2812_numpylut", ", bits=4"),
+                       ("write2812_numpylut", ", bits=8"),
+                       ("write2812_pylut", ", bits=3"),
+                       ("write2812_pylut", ", bits=4"),
+                       ("write2812_pylut", ", bits=8")
 ]:
+    name=function+args.replace(", bits=", "")
     for nLED in [5, 64, 144, 300]:
-        if (function[-1]=='8') and nLED>170:
+        if (name[-1]=='8') and nLED>170:
             continue
         
-        tCall=timeit.timeit(stmt=stmtFmt.format(function=function),
+        tCall=timeit.timeit(stmt=stmtFmt.format(function=function, args=args),
                             setup=setupFmt.format(nLED=nLED),
                             number=nCall)
-        print("{function:<20s}(nLED={nLED:3d}): {ms:6.2f} ms".format(function=function,
+        print("{function:<20s}(nLED={nLED:3d}): {ms:6.2f} ms".format(function=name,
                                                              nLED=nLED,
                                                              ms=1000*tCall/nCall))
 
+
+#Render + transmit pipeline: Strip does both in turn, ThreadedStrip
+#overlaps rendering frame N+1 with sending frame N.
+import spidev, effects
+
+def time_pipeline(strip, nFrame):
+    t0=timeit.default_timer()
+    for i in range(nFrame):
+        effects.plasma(strip.frame, 0.1*i)
+        strip.show()
+    if hasattr(strip, "flush"):
+        strip.flush()
+    return timeit.default_timer()-t0
+
+spi=spidev.SpiDev()
+spi.open(0,0)
+for cls in ["Strip", "ThreadedStrip"]:
+    for nLED in [64, 144, 300, 1000]:
+        if cls=="ThreadedStrip":
+            strip=ws2812.ThreadedStrip(spi, nLED, latest=False)
+        else:
+            strip=ws2812.Strip(spi, nLED)
+        tFrames=time_pipeline(strip, nCall)
+        if cls=="ThreadedStrip":
+            strip.close()
+        print("{cls:<20s}(nLED={nLED:4d}): {ms:6.2f} ms/frame".format(cls=cls,
+                                                                   nLED=nLED,
+                                                                   ms=1000*tFrames/nCall))
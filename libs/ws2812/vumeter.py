@@ -4,8 +4,8 @@
 # arecord -vv /dev/null
 
 import signal, sys
-import pyaudio, numpy
-import spidev, ws2812
+import numpy
+import spidev, ws2812, audioinput, stats
 
 PIXELS = 150
 DIVIDER = 10000/PIXELS
@@ -14,10 +14,12 @@ spi = spidev.SpiDev()
 spi.open(1,0)
 
 CHUNK = 2**11
+HOP = 2**9
 RATE = 44100
+#-v prints the peak meter for every window (4 lines per CHUNK at this HOP)
+VERBOSE = "-v" in sys.argv
 
-p = pyaudio.PyAudio()
-stream = p.open(format=pyaudio.paInt16,channels=1,rate=RATE,input=True,frames_per_buffer=CHUNK)
+audio = audioinput.AudioInput(RATE, window=CHUNK, hop=HOP).start()
 print("**INITIALIZED**")
 def signal_handler(sig, frame):
   print('You pressed Ctrl+C!')
@@ -25,23 +27,29 @@ def signal_handler(sig, frame):
   data = numpy.zeros((PIXELS, 3), dtype=numpy.uint8)
   ws2812.write2812(spi, data)
   #stop audio
-  stream.stop_stream()
-  stream.close()
-  p.terminate()
+  audio.close()
   sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
 
+#WS2812_STATS=10 logs stage timings every 10 s, kill -USR1 dumps them
+timing = stats.Stats.from_env().install().attach(audio)
+
 out = numpy.zeros((PIXELS, 3), dtype=int)
-for i in range(int(1000*44100/1024)): #go for a few seconds
-  data = numpy.fromstring(stream.read(CHUNK), dtype=numpy.int16)
+for i, data in enumerate(audio.windows()):
+  if i >= int(1000*44100/1024)*CHUNK/HOP: #go for a few seconds
+    break
   #peak=np.average(np.abs(data))*2
   #bars="#"*int(50*peak/2**16)
+  t = timing.now()
   peak = numpy.amax(numpy.abs(data))
-  bars = "#" * int(peak/200)
-  print("%04d %05d %s"%(i,peak,bars))
-  print("%05d %s"%(peak,bars))
+  t = timing.lap("analysis", t)
+  if VERBOSE:
+    print("%04d %05d %s"%(i,peak,"#" * int(peak/200)))
   out.fill(0)
   out[0:int(peak/200)] = (100, 0, 0)
+  t = timing.lap("render", t)
   ws2812.write2812(spi, out)
+  timing.lap("spi", t)
+  timing.frame()
 
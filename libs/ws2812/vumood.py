@@ -1,7 +1,9 @@
 import numpy as np
-import pyaudio
 import spidev
 import ws2812
+import audioinput
+import spectrum
+import stats
 import colorsys
 
 # Конфигурация
@@ -9,44 +11,35 @@ PIXELS = 90
 MAX_BRIGHTNESS = 255
 SPI_DEVICE = 1
 CHUNK = 2 ** 11
+HOP = 2 ** 9  # Новое окно анализа каждые HOP сэмплов
 RATE = 44100
 
 # Настройки басового детектора
 BASS_RANGE = (20, 200)  # Четкий диапазон басовых частот
-SMOOTHING_FACTOR = 0.3  # Плавность реакции
+# Плавность реакции: 0.3 на окно из CHUNK сэмплов, пересчитано на шаг HOP,
+# чтобы постоянная времени не зависела от частоты обновления
+SMOOTHING_FACTOR = 1 - (1 - 0.3) ** (HOP / float(CHUNK))
 BASS_THRESHOLD = 100  # Абсолютный порог баса (подбирается)
 MIN_DB_DIFFERENCE = 1  # Минимальное превышение баса над средним
 
 # Инициализация устройств
 spi = spidev.SpiDev()
 spi.open(SPI_DEVICE, 0)
+strip = ws2812.Strip(spi, PIXELS, order="GRB",
+                     brightness=MAX_BRIGHTNESS / 255)
+# Одинаковые кадры (сплошной цвет, чёрный без баса) не отправляются повторно,
+# раз в KEEPALIVE секунд кадр всё равно обновляется
+KEEPALIVE = 1.0
+strip.set_refresh(keepalive=KEEPALIVE)
 
-p = pyaudio.PyAudio()
-stream = p.open(format=pyaudio.paInt16, channels=1, rate=RATE,
-                input=True, frames_per_buffer=CHUNK)
+audio = audioinput.AudioInput(RATE, window=CHUNK, hop=HOP).start()
+# Окно, частоты и границы полос считаются один раз
+analyzer = spectrum.SpectrumAnalyzer(CHUNK, RATE, edges=(BASS_RANGE[0], BASS_RANGE[1], 1000))
 
-print("** BASS VISUALIZER INITIALIZED **")
-
-
-def calculate_bass_power(data, rate):
-    """Точный расчет мощности басовых частот в dB"""
-    # Применяем оконную функцию для улучшения FFT
-    window = np.hanning(len(data))
-    windowed_data = data * window
-
-    # Вычисляем FFT
-    fft = np.fft.rfft(windowed_data)
-    freqs = np.fft.rfftfreq(len(windowed_data), 1.0 / rate)
-
-    # Разделяем на низкие (бас) и средние частоты
-    bass_mask = (freqs >= BASS_RANGE[0]) & (freqs <= BASS_RANGE[1])
-    mid_mask = (freqs > BASS_RANGE[1]) & (freqs < 1000)
+# Тайминги этапов: WS2812_STATS=10 печатает сводку раз в 10 с, kill -USR1 - полную
+timing = stats.Stats.from_env().install().attach(strip, audio)
 
-    # Вычисляем энергию в dB
-    bass_energy = 10 * np.log10(np.sum(np.abs(fft[bass_mask]) ** 2) + 1e-10)
-    mid_energy = 10 * np.log10(np.sum(np.abs(fft[mid_mask]) ** 2) + 1e-10)
-
-    return bass_energy, mid_energy
+print("** BASS VISUALIZER INITIALIZED **")
 
 
 def is_bass_active(bass_db, mid_db):
@@ -58,11 +51,7 @@ def get_bass_color(bass_strength):
     """Генерация цвета от синего (тихий) до красного (громкий)"""
     hue = 0.66 - (0.66 * bass_strength)  # 0.66=синий, 0.0=красный
     r, g, b = colorsys.hls_to_rgb(hue, 0.5, 1.0)
-    return (
-        int(g * MAX_BRIGHTNESS),
-        int(r * MAX_BRIGHTNESS),
-        int(b * MAX_BRIGHTNESS)
-    )
+    return int(r * 255), int(g * 255), int(b * 255)
 
 def smooth_value(current, target, factor):
     """Экспоненциальное сглаживание значения"""
@@ -70,18 +59,12 @@ def smooth_value(current, target, factor):
 
 try:
     smoothed_bass = 0
-    out = [[0, 0, 0] for _ in range(PIXELS)]
-
-    while True:
-        # Чтение аудиоданных
-        data = np.frombuffer(
-            stream.read(CHUNK, exception_on_overflow=False),
-            dtype=np.int16
-        )
-
+    # Чтение аудиоданных: перекрывающиеся окна по CHUNK сэмплов
+    for data in audio.windows():
         # Анализ частот
-        bass_db, mid_db = calculate_bass_power(data, RATE)
-        print("Bass: {:.2f} dB, Mid: {:.2f} dB".format(bass_db, mid_db))
+        t = timing.now()
+        bass_db, mid_db = analyzer.process(data)
+        t = timing.lap("analysis", t)
 
         # Проверка наличия баса
         if is_bass_active(bass_db, mid_db):
@@ -94,17 +77,15 @@ try:
             color = (0, 0, 0)
 
         # Обновление ленты
-        for i in range(PIXELS):
-            out[i] = color
-        ws2812.write2812(spi, out)
+        strip.frame[:] = color
+        timing.lap("render", t)
+        strip.show()
 
 except KeyboardInterrupt:
     print("\nStopping...")
 
 finally:
     # Корректное завершение
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
-    ws2812.write2812(spi, [[0, 0, 0] for _ in range(PIXELS)])
+    audio.close()
+    strip.clear()
     spi.close()
\ No newline at end of file
@@ -0,0 +1,39 @@
+import numpy
+import signal, sys
+import spidev, ws2812, effects, audioinput, stats, spectrum
+
+PIXELS = 150
+BANDS = 30
+SPI_DEVICE = 1
+
+spi = spidev.SpiDev()
+spi.open(SPI_DEVICE, 0)
+strip = ws2812.Strip(spi, PIXELS)
+
+CHUNK = 2**11
+HOP = 2**9
+RATE = 44100
+
+audio = audioinput.AudioInput(RATE, window=CHUNK, hop=HOP).start()
+analyzer = spectrum.SpectrumAnalyzer(CHUNK, RATE, nBands=BANDS, fmin=40)
+
+def signal_handler(sig, frame):
+  print('You pressed Ctrl+C!')
+  #clear leds
+  strip.clear()
+  #stop audio
+  audio.close()
+  sys.exit(0)
+
+signal.signal(signal.SIGINT, signal_handler)
+
+#WS2812_STATS=10 logs stage timings every 10 s, kill -USR1 dumps them
+timing = stats.Stats.from_env().install().attach(strip, audio)
+
+for data in audio.windows():
+  t = timing.now()
+  analyzer.process(data)
+  t = timing.lap("analysis", t)
+  effects.spectrum(strip.frame, analyzer.level)
+  timing.lap("render", t)
+  strip.show()
@@ -1,32 +1,51 @@
 #!/usr/bin/python
 import spidev
 import ws2812
-import time
+import frameclock
+import bake as bakemod
+import fixedpoint
 import numpy
 from numpy import sin, pi
 
-def test_pattern_sin(spi, nLED=8, intensity=20):
-    tStart=time.time()
+def test_pattern_sin(spi, nLED=8, intensity=20, bake=False, fixed=False):
+    strip=ws2812.Strip(spi, nLED)
     indices=4*numpy.array(range(nLED), dtype=numpy.uint32)*numpy.pi/nLED
     period0=2
     period1=2.1
     period2=2.2
+    fps=100
+    def render(fi, t):
+        if fixed:
+            #same pattern from integer phase tables, no sin() per pixel
+            fixedpoint.wave(fi, t, (period0, period1, period2), intensity)
+            return
+        t=-t
+        #t=1.1
+        f=numpy.zeros((nLED,3))
+        f[:,0]=sin(2*pi*t/period0+indices)
+        f[:,1]=sin(2*pi*t/period1+indices)
+        f[:,2]=sin(2*pi*t/period2+indices)
+        f=(intensity)*((f+1.0)/2.0)
+        fi[:]=numpy.array(f, dtype=numpy.uint8)
     try:
-        while True:
-            t=tStart-time.time()
-            #t=1.1
-            f=numpy.zeros((nLED,3))
-            f[:,0]=sin(2*pi*t/period0+indices)
-            f[:,1]=sin(2*pi*t/period1+indices)
-            f[:,2]=sin(2*pi*t/period2+indices)
-            f=(intensity)*((f+1.0)/2.0)
-            fi=numpy.array(f, dtype=numpy.uint8)
+        if bake:
+            #the three waves line up again after lcm(2, 2.1, 2.2) = 462 s
+            period=bakemod.loop_period((period0, period1, period2))
+            try:
+                path=bakemod.bake(strip, render, period, fps,
+                                  params=dict(intensity=intensity, fixed=fixed))
+            except ValueError as err:
+                #long strips: 462 s of frames is too big, render live instead
+                print("Warning: not baking: %s" % err)
+            else:
+                bakemod.play(strip, path)
+        for t in frameclock.FrameClock(fps):
+            render(strip.frame, t)
             #print fi[0]
             #time_write2812(spi, fi)
-            ws2812.write2812(spi, fi)
-            time.sleep(0.01)
+            strip.show()
     except KeyboardInterrupt:
-        test_off(spi, nLED)
+        strip.clear()
 
 def test_off(spi, nLED):
     ws2812.write2812(spi, [0, 0, 0] * nLED)
@@ -1,33 +1,53 @@
 #!/usr/bin/python
+import os
 import sys
+import threading
+import time
+import timeit
+numpy=None
 NumpyImported=False
-#try:
-#    import numpy
-#    from numpy import sin, cos, pi
-#    NumpyImported=True
-#except ImportError:
-#    #print("Warning: no numpy found, routines will be slow")
-#    pass
-if 'numpy' in sys.modules:
-  import numpy
-  NumpyImported=True
-else:
-  print("Warning: no numpy used, routines will be slow")
+
+def load_numpy():
+  """Import numpy on first use instead of relying on import order."""
+  global numpy, NumpyImported, _LUT_numpy
+  if numpy is None:
+    try:
+      import numpy
+    except ImportError:
+      return None
+    NumpyImported=True
+    _LUT_numpy = dict((bits, numpy.frombuffer(b"".join(lut), dtype=numpy.uint8).reshape(256, bits))
+                      for bits, lut in _LUT.items())
+  return numpy
 
 """
 T0H: 0.35   -> 2p=0.31  3p=0.47
 T0L: 0.80   -> 6p=0.94  5p=0.78
 T1H: 0.70   -> 4p=0.625 5p=0.78
 T1L: 0.60   -> 4p=0.625 3p=0.47
+
+Encodings (SPI bits per WS2812 bit, clock):
+  3: 0=100 1=110 at 2.4MHz    (period 1.25us,  9 bytes/LED)
+  4: 0=1000 1=1110 at 3.8MHz  (period 1.05us, 12 bytes/LED)
+  8: 0=11000000 1=11110000 at 6.4MHz (period 1.25us, 24 bytes/LED)
 """
 
+#(zero symbol, one symbol) for each encoding
+SYMBOLS = {3: (0b100, 0b110),
+           4: (0b1000, 0b1110),
+           8: (0b11000000, 0b11110000)}
+SPEED = {3: int(3/1.25e-6),
+         4: int(4/1.05e-6),
+         8: int(8/1.25e-6)}
+
 def write2812_numpy4(spi, data):
+  load_numpy()
   d = numpy.array(data).ravel()
   tx = numpy.zeros(len(d)*4, dtype=numpy.uint8)
   for ibit in range(4):
     tx[3-ibit::4]=((d>>(2*ibit+1))&1)*0x60 + ((d>>(2*ibit+0))&1)*0x06 + 0x88
   tx = numpy.insert(tx, 0, 0x00)
-  spi.max_speed_hz = int(4/1.05e-6)
+  spi.max_speed_hz = SPEED[4]
   spi.writebytes(tx.tolist())
 
 def write2812_pylist4(spi, data):
@@ -38,13 +58,556 @@ def write2812_pylist4(spi, data):
         tx.append(((byte>>(2*ibit+1))&1)*0x60 +
                   ((byte>>(2*ibit+0))&1)*0x06 +
                   0x88)
-  spi.max_speed_hz = int(4/1.05e-6)
+  spi.max_speed_hz = SPEED[4]
+  spi.writebytes(tx)
+
+def write2812_numpy8(spi, data):
+  load_numpy()
+  d = numpy.array(data).ravel()
+  tx = numpy.zeros(len(d)*8, dtype=numpy.uint8)
+  for ibit in range(8):
+    tx[7-ibit::8]=((d>>ibit)&1)*0x30 + 0xC0
+  tx = numpy.insert(tx, 0, 0x00)
+  spi.max_speed_hz = SPEED[8]
+  spi.writebytes(tx.tolist())
+
+def write2812_pylist8(spi, data):
+  tx=[0x00]
+  for rgb in data:
+    for byte in rgb:
+      for ibit in range(7,-1,-1):
+        tx.append(((byte>>ibit)&1)*0x30 + 0xC0)
+  spi.max_speed_hz = SPEED[8]
   spi.writebytes(tx)
 
-if NumpyImported:
-  write2812=write2812_numpy4
-else:
-  write2812=write2812_pylist4
+#Lookup tables: every colour byte maps to the same `bits` SPI bytes,
+#so encode each of the 256 values once instead of per frame.
+def _make_lut(bits):
+  zero, one = SYMBOLS[bits]
+  lut = []
+  for byte in range(256):
+    word = 0
+    for ibit in range(7,-1,-1):
+      word = (word<<bits) | (one if (byte>>ibit)&1 else zero)
+    lut.append(bytes(bytearray((word>>(8*i))&0xff for i in range(bits-1,-1,-1))))
+  return lut
+
+_LUT = dict((bits, _make_lut(bits)) for bits in SYMBOLS)
+
+def write2812_numpylut(spi, data, bits=4):
+  load_numpy()
+  d = numpy.asarray(data, dtype=numpy.uint8).ravel()
+  tx = numpy.empty(len(d)*bits+1, dtype=numpy.uint8)
+  tx[0] = 0x00
+  numpy.take(_LUT_numpy[bits], d, axis=0, out=tx[1:].reshape(-1, bits), mode="clip")
+  spi.max_speed_hz = SPEED[bits]
+  spi.writebytes2(tx)
+
+def write2812_pylut(spi, data, bits=4):
+  lut = _LUT[bits]
+  tx = b"\x00" + b"".join([lut[byte] for rgb in data for byte in rgb])
+  spi.max_speed_hz = SPEED[bits]
+  spi.writebytes2(tx)
+
+class Backend(object):
+  """
+  An encoder implementation.
+    write:     stateless write2812(spi, data, bits) using this backend
+    arrays:    Strip keeps numpy frame/transmit buffers (else bytearrays)
+    take:      gather Strip uses on numpy buffers, take(lut, index, out)
+               with index an intp array, writing into out in place
+    available: returns True when the backend can run on this host
+  """
+  def __init__(self, name, write, arrays=False, take=None, available=None):
+    self.name = name
+    self.write = write
+    self.arrays = arrays
+    self.take = take
+    self._available = available
+
+  def available(self):
+    return self._available is None or bool(self._available())
+
+  def __repr__(self):
+    return "Backend(%r)" % self.name
+
+#name -> Backend, BACKEND_ORDER is the order of preference
+BACKENDS = {}
+BACKEND_ORDER = []
+
+def register_backend(name, write, arrays=False, take=None, available=None):
+  if name not in BACKENDS:
+    BACKEND_ORDER.append(name)
+  BACKENDS[name] = Backend(name, write, arrays, take, available)
+  return BACKENDS[name]
+
+def _numpy_take(lut, index, out):
+  #mode="raise" would buffer out; index is always 0..255
+  numpy.take(lut, index, axis=0, out=out, mode="clip")
+
+register_backend("numpy", write2812_numpylut, arrays=True, take=_numpy_take,
+                 available=lambda: load_numpy() is not None)
+register_backend("stdlib", write2812_pylut)
+
+def available_backends():
+  return [name for name in BACKEND_ORDER if BACKENDS[name].available()]
+
+def get_backend(name=None, nLED=None, bits=4):
+  """
+  Resolve a backend name. None uses $WS2812_BACKEND, else the first
+  available one; "fastest" times every available backend for nLED.
+  """
+  if name is None:
+    name = os.environ.get("WS2812_BACKEND") or available_backends()[0]
+  if name == "fastest":
+    return fastest_backend(nLED or 150, bits)
+  if name not in BACKENDS:
+    raise ValueError("unknown backend %r, known: %s" % (name, ", ".join(BACKEND_ORDER)))
+  backend = BACKENDS[name]
+  if not backend.available():
+    raise ValueError("backend %r is not available" % name)
+  return backend
+
+class _NullSpi(object):
+  max_speed_hz = 0
+  def writebytes2(self, data):
+    pass
+
+_fastest = {}
+
+def fastest_backend(nLED, bits=4, repeat=5):
+  """Time Strip.encode of every available backend for nLED, cached."""
+  key = (nLED, bits)
+  if key not in _fastest:
+    times = []
+    for name in available_backends():
+      strip = Strip(_NullSpi(), nLED, bits, backend=name)
+      times.append((min(timeit.repeat(strip.encode, number=3, repeat=repeat)), name))
+    _fastest[key] = BACKENDS[min(times)[1]]
+  return _fastest[key]
+
+_selected = None
+
+def select_backend(name=None):
+  """Choose the backend used by write2812 and by default by Strip."""
+  global _selected
+  _selected = get_backend(name)
+  if _selected.name == "stdlib" and "numpy" not in available_backends():
+    print("Warning: no numpy used, routines will be slow")
+  return _selected
+
+def write2812(spi, data, bits=4):
+  if _selected is None:
+    select_backend()
+  _selected.write(spi, data, bits)
+
+#Perceptual gamma correction, input byte -> output level
+GAMMA = (0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1,1,1,1,1,1,1,1,1,1,1,1,1,2,2,2,2,2,2,2,2,3,3,3,3,3,3,3,4,4,4,4,4,5,5,5,5,6,6,6,6,7,7,7,7,8,8,8,9,9,9,10,10,10,11,11,11,12,12,13,13,13,14,14,15,15,16,16,17,17,18,18,19,19,20,20,21,21,22,22,23,24,24,25,25,26,27,27,28,29,29,30,31,32,32,33,34,35,35,36,37,38,39,39,40,41,42,43,44,45,46,47,48,49,50,50,51,52,54,55,56,57,58,59,60,61,62,63,64,66,67,68,69,70,72,73,74,75,77,78,79,81,82,83,85,86,87,89,90,92,93,95,96,98,99,101,102,104,105,107,109,110,112,114,115,117,119,120,122,124,126,127,129,131,133,135,137,138,140,142,144,146,148,150,152,154,156,158,160,162,164,167,169,171,173,175,177,180,182,184,186,189,191,193,196,198,200,203,205,208,210,213,215,218,220,223,225,228,231,233,236,239,241,244,247,249,252,255)
+
+#WS2812 draws ~20mA per fully lit channel
+MA_PER_CHANNEL = 20.
+
+#Low time after which the strip latches the frame (>280us on newer parts)
+LATCH = 50e-6
+
+def max_transfer():
+  """Largest single spidev transfer in bytes (the spidev bufsiz parameter)."""
+  try:
+    with open("/sys/module/spidev/parameters/bufsiz") as f:
+      return int(f.read())
+  except (IOError, ValueError):
+    return 4096
+
+class Strip(object):
+  """
+  Persistent output for a strip of nLED pixels. The (nLED, 3) frame and
+  the encoded SPI buffer are allocated once and reused by every show(),
+  and the bus speed for the chosen encoding is set only when the strip
+  is created.
+
+  The frame is always RGB. The output stage (see set_output) applies
+  gamma, brightness, the strip's channel order and an optional current
+  limit; gamma and brightness are folded into the encoding lookup table
+  so encoding stays a single gather over the frame. With set_layout the
+  frame is 2D (see matrix.py); the wiring permutation and the channel
+  order are then one more gather.
+
+  Frames longer than the spidev buffer are sent as back-to-back
+  transfers split on LED boundaries. The idle time between transfers is
+  measured and reported if it gets long enough to latch the strip, and
+  a warning is printed if the strip cannot reach the requested fps.
+
+  With set_refresh, frames identical to the last one sent are not
+  encoded or sent again, apart from an optional keep-alive.
+  """
+  def __init__(self, spi, nLED, bits=4, fps=None, backend=None, **output):
+    self.spi = spi
+    self.nLED = nLED
+    self.bits = bits
+    if backend is None and _selected is not None:
+      self.backend = _selected
+    else:
+      self.backend = get_backend(backend, nLED, bits)
+    self.arrays = self.backend.arrays
+    self._take = self.backend.take
+    self.maxTransfer = max_transfer()
+    #whole LEDs per transfer; the first transfer also carries the 0x00
+    self.chunk = max(3*bits, (self.maxTransfer-1)//(3*bits)*(3*bits))
+    self.gap = 0.0
+    self.stats = None   #stats.Stats timing encode and spi
+    self.layout = None
+    self.set_refresh(skip=False)
+    if self.arrays:
+      self.frame = numpy.zeros((nLED, 3), dtype=numpy.uint8)
+      self._ordered = numpy.zeros(nLED*3, dtype=numpy.uint8)
+      self._levelbuf = numpy.zeros(nLED*3, dtype=numpy.intp)   #intp: sum() without a cast buffer
+      #the frame as intp: numpy.take converts other index types into a temporary
+      self._index = numpy.zeros(nLED*3, dtype=numpy.intp)
+      self._tx = numpy.zeros(nLED*3*bits+1, dtype=numpy.uint8)
+      self._txbody = self._tx[1:].reshape(nLED*3, bits)
+    else:
+      self.frame = bytearray(nLED*3)
+      self._tx = bytearray(nLED*3*bits+1)
+    self.set_output(**output)
+    spi.max_speed_hz = SPEED[bits]
+    if fps is not None and self.max_fps() < fps:
+      print("Warning: %d LEDs need %.2f ms per frame (%d transfers), "
+            "%.1f fps max, %s fps requested" % (nLED, 1000*self.frame_time(),
+                                                self.transfers(), self.max_fps(), fps))
+
+  def transfers(self):
+    """Number of SPI transfers per frame."""
+    return max(1, -(-(len(self._tx)-1)//self.chunk))
+
+  def frame_time(self):
+    """Estimated seconds on the bus per frame, including the latch."""
+    wire = len(self._tx)*8.0/SPEED[self.bits]
+    return wire + (self.transfers()-1)*self.gap + LATCH
+
+  def max_fps(self):
+    return 1.0/self.frame_time()
+
+  def set_output(self, gamma=None, brightness=1.0, order="RGB", max_mA=None):
+    """
+    gamma:      None, True (use GAMMA) or a 256-entry table
+    brightness: master brightness 0.0-1.0, applied after gamma
+    order:      channel order on the wire, e.g. "GRB" for WS2812
+    max_mA:     scale the whole frame down when it would draw more
+    """
+    if gamma is True:
+      gamma = GAMMA
+    elif gamma is None:
+      gamma = range(256)
+    if sorted(order.upper()) != ["B", "G", "R"]:
+      raise ValueError("order must be a permutation of RGB, got %r" % (order,))
+    self.gamma = gamma
+    self.brightness = brightness
+    self.order = order.upper()
+    self.max_mA = max_mA
+    self._order = ["RGB".index(c) for c in self.order]
+    self._update_gather()
+    self._sent = None
+    self._levels = [max(min(int(round(g*brightness)), 255), 0) for g in gamma]
+    self._lut = self._make_lut(1.0)
+    if self.arrays:
+      self._levels_numpy = numpy.array(self._levels, dtype=numpy.intp)
+      #current limited LUT, rebuilt in place when a frame is over max_mA
+      self._levelsFloat = self._levels_numpy.astype(numpy.float64)
+      self._scaled = numpy.zeros(256, dtype=numpy.float64)
+      self._scaledLevels = numpy.zeros(256, dtype=numpy.intp)
+      self._scaledLut = numpy.zeros((256, self.bits), dtype=numpy.uint8)
+
+  def set_layout(self, layout):
+    """
+    Render into a 2D frame: layout (e.g. matrix.Matrix) has a shape and
+    an index giving the logical pixel of every LED on the wire. frame
+    becomes a (height, width, 3) array; None goes back to (nLED, 3).
+    """
+    if not self.arrays:
+      raise ValueError("layouts need a numpy backed Strip")
+    if layout is not None and len(layout.index) != self.nLED:
+      raise ValueError("layout has %d LEDs, strip has %d" % (len(layout.index), self.nLED))
+    self.layout = layout
+    shape = (self.nLED,) if layout is None else tuple(layout.shape)
+    self.frame = numpy.zeros(shape + (3,), dtype=numpy.uint8)
+    self._update_gather()
+    self._sent = None
+
+  def _update_gather(self):
+    #flat frame index of every byte on the wire: layout and channel order in one take
+    self._gather = None
+    if self.arrays and (self.layout is not None or self._order != [0, 1, 2]):
+      pixels = numpy.arange(self.nLED) if self.layout is None else numpy.asarray(self.layout.index)
+      self._gather = (pixels[:, None]*3 + numpy.array(self._order)).reshape(-1)
+
+  def _make_lut(self, scale):
+    if self.arrays and scale != 1.0:
+      #levels*scale truncated like int(), then the encoding of each level
+      numpy.multiply(self._levelsFloat, scale, out=self._scaled)
+      numpy.copyto(self._scaledLevels, self._scaled, casting="unsafe")
+      numpy.take(_LUT_numpy[self.bits], self._scaledLevels, axis=0, out=self._scaledLut, mode="clip")
+      return self._scaledLut
+    enc = _LUT[self.bits]
+    if scale == 1.0:
+      levels = self._levels
+    else:
+      levels = [int(level*scale) for level in self._levels]
+    lut = [enc[level] for level in levels]
+    if self.arrays:
+      lut = numpy.frombuffer(b"".join(lut), dtype=numpy.uint8).reshape(256, self.bits)
+    return lut
+
+  def set_refresh(self, skip=True, keepalive=None):
+    """
+    skip:      show() does not send a frame identical to the last one
+               sent (skipped counts them, unchanged counts identical
+               frames in a row)
+    keepalive: resend an unchanged frame after this many seconds
+
+    A frame-clocked loop can idle while the content is static:
+      clock.set_fps(IDLE_FPS if strip.unchanged > FPS else FPS)
+    """
+    self.skip = skip
+    self.keepalive = keepalive
+    self.skipped = 0
+    self.unchanged = 0
+    self._sent = None      #copy of the last frame sent, None: unknown
+    self._sentbuf = None   #preallocated for _sent and the comparison
+    self._diff = None
+    self._tSent = 0.0
+
+  def _same(self):
+    #True if show() can skip the frame; otherwise remember it as sent
+    if self.arrays:
+      frame = self.frame
+      if self._sentbuf is None or self._sentbuf.shape != frame.shape:
+        #first frame, or frame replaced (set_layout, attached renderer)
+        self._sentbuf = numpy.empty_like(frame)
+        self._diff = numpy.empty(frame.shape, dtype=bool)
+        self._sent = None
+      same = self._sent is not None and not numpy.not_equal(frame, self._sent, out=self._diff).any()
+    else:
+      frame = bytes(self.frame)
+      same = frame == self._sent
+    if same:
+      self.unchanged += 1
+      if self.keepalive is None or time.perf_counter()-self._tSent < self.keepalive:
+        self.skipped += 1
+        if self.stats is not None:
+          self.stats.count("skipped")
+        return True
+    else:
+      self.unchanged = 0
+      if self.arrays:
+        numpy.copyto(self._sentbuf, frame)
+        self._sent = self._sentbuf
+      else:
+        self._sent = frame
+    self._tSent = time.perf_counter()
+    return False
+
+  def set(self, data):
+    if self.arrays:
+      self.frame[...] = data
+    else:
+      flat = bytes(bytearray(byte for rgb in data for byte in rgb))
+      if len(flat) != len(self.frame):
+        raise ValueError("expected %d pixels, got %d" % (self.nLED, len(flat)//3))
+      self.frame[:] = flat
+
+  def current(self):
+    """Estimated current draw of the frame in mA, before max_mA."""
+    if self.arrays:
+      numpy.copyto(self._index, self.frame.reshape(-1))
+      numpy.take(self._levels_numpy, self._index, out=self._levelbuf, mode="clip")
+      total = int(self._levelbuf.sum())
+    else:
+      total = sum(map(self._levels.__getitem__, self.frame))
+    return total*MA_PER_CHANNEL/255.
+
+  def encode(self):
+    lut = self._lut
+    if self.max_mA is not None:
+      mA = self.current()
+      if mA > self.max_mA:
+        lut = self._make_lut(self.max_mA/mA)
+    if self.arrays:
+      frame = self.frame.reshape(-1)
+      if self._gather is not None:
+        frame = numpy.take(frame, self._gather, out=self._ordered, mode="clip")
+      numpy.copyto(self._index, frame)
+      self._take(lut, self._index, self._txbody)
+    else:
+      o0, o1, o2 = self._order
+      f = self.frame
+      channels = zip(map(lut.__getitem__, f[o0::3]),
+                     map(lut.__getitem__, f[o1::3]),
+                     map(lut.__getitem__, f[o2::3]))
+      self._tx[1:] = b"".join([code for rgb in channels for code in rgb])
+    return self._tx
+
+  def _write(self, tx):
+    if len(tx) <= self.maxTransfer:
+      self.spi.writebytes2(tx)
+      return
+    view = memoryview(tx)
+    write = self.spi.writebytes2
+    speed = float(SPEED[self.bits])
+    gap = 0.0
+    start, end = 0, self.chunk+1
+    while start < len(tx):
+      t0 = time.perf_counter()
+      write(view[start:end])
+      #time not spent clocking bits is idle bus time before the next transfer
+      gap = max(gap, time.perf_counter()-t0 - len(view[start:end])*8/speed)
+      start, end = end, end+self.chunk
+    if gap > LATCH and self.gap <= LATCH:
+      print("Warning: %.0f us between SPI transfers can latch the strip mid-frame; "
+            "raise spidev bufsiz above %d bytes" % (1e6*gap, len(tx)))
+    self.gap = max(self.gap, gap)
+
+  def show(self, data=None):
+    if data is not None:
+      self.set(data)
+    if self.skip and self._same():
+      return
+    stats = self.stats
+    if stats is None:
+      self._write(self.encode())
+      return
+    t = stats.now()
+    tx = self.encode()
+    t = stats.lap("encode", t)
+    self._write(tx)
+    stats.lap("spi", t)
+    stats.frame()
+
+  def clear(self):
+    if self.arrays:
+      self.frame.fill(0)
+    else:
+      self.frame[:] = bytearray(len(self.frame))
+    self.show()
+
+class ThreadedStrip(Strip):
+  """
+  Strip whose SPI transfers run on a background writer thread, so the
+  next frame is rendered and encoded while the previous one is clocked
+  out (the spidev ioctl releases the GIL).
+
+  Two transmit buffers are used: one on the wire, one pending. With
+  latest=True a new frame replaces a pending one that has not been sent
+  yet (counted in dropped), which keeps audio reactive effects in sync;
+  with latest=False show() blocks until the pending slot is free.
+
+  If a transfer fails the writer thread stops, and show(), flush() and
+  close() raise its exception.
+  """
+  def __init__(self, spi, nLED, bits=4, fps=None, backend=None, latest=True, **output):
+    Strip.__init__(self, spi, nLED, bits, fps, backend, **output)
+    self.latest = latest
+    self.dropped = 0
+    if self.arrays:
+      tx = numpy.zeros_like(self._tx)
+      self._buffers = [(self._tx, self._txbody),
+                       (tx, tx[1:].reshape(nLED*3, bits))]
+    else:
+      self._buffers = [(self._tx, None), (bytearray(self._tx), None)]
+    self._pending = None
+    self._sending = None
+    self._running = True
+    self._error = None
+    self._cond = threading.Condition()
+    self._thread = threading.Thread(target=self._run, name="ws2812-writer")
+    self._thread.daemon = True
+    self._thread.start()
+
+  def _run(self):
+    cond = self._cond
+    while True:
+      with cond:
+        while self._pending is None and self._running:
+          cond.wait()
+        if self._pending is None:
+          return
+        self._sending, self._pending = self._pending, None
+        cond.notify_all()
+      stats = self.stats
+      try:
+        if stats is None:
+          self._write(self._sending[0])
+        else:
+          t = stats.now()
+          self._write(self._sending[0])
+          stats.lap("spi", t)
+      except Exception as err:
+        #hand the error to show() instead of leaving it waiting for the buffer
+        with cond:
+          self._error = err
+          self._sending = self._pending = None
+          self._running = False
+          cond.notify_all()
+        return
+      with cond:
+        self._sending = None
+        cond.notify_all()
+
+  def _check(self):
+    if self._error is not None:
+      raise self._error
+
+  def _acquire(self):
+    #take ownership of a buffer that is neither on the wire nor pending
+    with self._cond:
+      self._check()
+      if self._pending is not None:
+        if self.latest:
+          buf, self._pending = self._pending, None
+          self.dropped += 1
+          if self.stats is not None:
+            self.stats.count("dropped")
+          return buf
+        while self._pending is not None and self._error is None:
+          self._cond.wait()
+        self._check()
+      for buf in self._buffers:
+        if buf is not self._sending:
+          return buf
+
+  def show(self, data=None):
+    if data is not None:
+      self.set(data)
+    if self.skip and self._same():
+      return
+    buf = self._acquire()
+    self._tx, self._txbody = buf
+    stats = self.stats
+    if stats is None:
+      self.encode()
+    else:
+      t = stats.now()
+      self.encode()
+      stats.lap("encode", t)
+      stats.frame()
+    with self._cond:
+      self._check()
+      self._pending = buf
+      self._cond.notify_all()
+
+  def flush(self):
+    """Wait until every submitted frame has been sent."""
+    with self._cond:
+      while (self._pending is not None or self._sending is not None) and self._error is None:
+        self._cond.wait()
+      self._check()
+
+  def close(self):
+    """Send the pending frame and stop the writer thread."""
+    with self._cond:
+      self._running = False
+      self._cond.notify_all()
+    self._thread.join()
+    self._check()
 
 def usage():
   print("Usage:")
@@ -54,25 +617,27 @@ def usage():
   print("-t", "--test")
   print("-z", "--clear")
   print("-s", "--SPI", "default=0")
+  print("-b", "--bits", "default=4 (3, 4 or 8 SPI bits per bit)")
+  print("-e", "--backend", "default=$WS2812_BACKEND or first of", ", ".join(BACKEND_ORDER))
 
 if __name__=="__main__":
   import spidev, time, getopt
 
-  def test_fixed(spi):
+  def test_fixed(spi, bits=4):
     #write fixed pattern for 8 LEDs
     #This will send the following colors:
     #   Red, Green, Blue,
     #   Purple, Cyan, Yellow,
     #   Black(off), White
-    write2812_pylist4(spi, [[10,0,0], [0,10,0], [0,0,10],
-                           [0,10,10], [10,0,10], [10,10,0],
-                           [0,0,0], [10,10,10]])
-  def test_clear(spi, nLED=8):
+    write2812(spi, [[10,0,0], [0,10,0], [0,0,10],
+                    [0,10,10], [10,0,10], [10,10,0],
+                    [0,0,0], [10,10,10]], bits)
+  def test_clear(spi, nLED=8, bits=4):
     #switch all nLED chips OFF.
-    write2812_pylist4(spi, [[0,0,0]]*nLED)
+    write2812(spi, [[0,0,0]]*nLED, bits)
 
   try:
-    opts, args = getopt.getopt(sys.argv[1:], "htzn:c:s:", ["help", "color=", "nLED=", "test", "clear", "SPI="])
+    opts, args = getopt.getopt(sys.argv[1:], "htzn:c:s:b:e:", ["help", "color=", "nLED=", "test", "clear", "SPI=", "bits=", "backend="])
   except getopt.GetoptError as err:
     # print help information and exit:
     print(str(err)) # will print something like "option -a not recognized"
@@ -83,6 +648,8 @@ if __name__=="__main__":
   nSPI=0
   doTest=False
   doClear=False
+  bits=4
+  backend=None
   for o, a in opts:
     if o in ("-h", "--help"):
       usage()
@@ -97,15 +664,20 @@ if __name__=="__main__":
       doTest=True
     elif o in ("-z", "--clear"):
       doClear=True
+    elif o in ("-b", "--bits"):
+      bits=int(a)
+    elif o in ("-e", "--backend"):
+      backend=a
 
+  select_backend(backend)
   spi = spidev.SpiDev()
   spi.open(nSPI,0)
 
   if color!=None:
-    write2812_pylist4(spi, eval(color)*nLED)
+    write2812(spi, eval(color)*nLED, bits)
   elif doTest:
-    test_fixed(spi)
+    test_fixed(spi, bits)
   elif doClear:
-    test_clear(spi)
+    test_clear(spi, nLED, bits)
   else:
     usage()
@@ -7,20 +7,20 @@ LEDS_NUM = 90
 
 spi = spidev.SpiDev()
 spi.open(1,0)
-ws2812.write2812(spi, [[10, 0, 0], [0, 10, 0], [0, 0, 10], [10, 10, 0]])
+strip = ws2812.Strip(spi, LEDS_NUM)
+#unchanged frames (e.g. clearing a strip that is already off) are not resent
+strip.set_refresh()
+strip.show([[10, 0, 0], [0, 10, 0], [0, 0, 10], [10, 10, 0]] + [[0, 0, 0]]*(LEDS_NUM-4))
 
 def ClearAll():
-    buf = []
-    for i in range(LEDS_NUM):
-        buf.append([0, 0, 0])
-    ws2812.write2812(spi, buf)
+    strip.clear()
 
 while True:
     buf = [[0, 0, 0] for i in range(LEDS_NUM)]
     for i in range(LEDS_NUM):
         buf[i] = [random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)]
         time.sleep(0.01)
-        ws2812.write2812(spi, buf)
+        strip.show(buf)
     time.sleep(1)
     ClearAll()
     time.sleep(1)
\ No newline at end of file